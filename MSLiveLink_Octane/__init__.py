@@ -13,11 +13,21 @@
 #
 # ##### QUIXEL AB - MEGASCANS LIVELINK FOR BLENDER #####
 
-import bpy, threading, os, time, json, socket
+import bpy, threading, os, time, json, socket, selectors, queue, re, tempfile
+import concurrent.futures, collections, contextlib, zlib, atexit, hashlib
 from bpy.types import Operator, AddonPreferences
-from bpy.props import IntProperty, EnumProperty, BoolProperty
+from bpy.props import IntProperty, EnumProperty, BoolProperty, StringProperty
+from bpy.app.handlers import persistent
+from .bridge_stream import MS_JsonArrayParser
 
-globals()['Megascans_DataSet'] = None
+# NumPy ships with Blender, it is only needed to build channel-packed textures.
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Parsed Bridge assets, as (MS_AssetRecord, batch, stamps) tuples, waiting to be imported on the main thread.
+Megascans_ImportQueue = queue.Queue()
 
 bl_info = {
     "name": "Megascans LiveLink Octane",
@@ -52,9 +62,51 @@ disp_levels_texture = [
     ('OCTANE_DISPLACEMENT_LEVEL_8192', '8192', '8192x8192')
 ]
 
+lod_policies = [
+    ('HIGHEST', 'Highest', 'Import only the most detailed mesh'),
+    ('FIXED', 'Fixed LOD', 'Import only the selected LOD, or the closest one available'),
+    ('ALL', 'All LODs', 'Import every LOD, the most detailed one is visible and the others are hidden')
+]
+
+proxy_sizes = [
+    ('512', '512', '512x512'),
+    ('1024', '1024', '1024x1024'),
+    ('2048', '2048', '2048x2048')
+]
+
+# Switch the proxied images between their full resolution and proxy files.
+def updateProxyResolution(self, context):
+    try:
+        Megascans_ProxyTextures.useFullResolution(self.proxy_full_resolution)
+    except Exception as e:
+        print( "Megascans LiveLink Error switching proxy textures. Error: ", str(e) )
+
+# Restart the listener on the new port.
+def updateServerPort(self, context):
+    if Megascans_LiveLink.isRunning():
+        Megascans_LiveLink.restart()
+
 class MSLiveLinkPrefs(AddonPreferences):
     bl_idname = __name__
     
+    port: IntProperty(
+        name="Port",
+        description="Port the LiveLink listens to, Bridge exports to 28888 (use another port behind the dispatcher)",
+        min=1024,
+        max=65535,
+        default=28888,
+        update=updateServerPort
+    )
+
+    port_range: IntProperty(
+        name="Fallback Ports",
+        description="Number of ports tried from the port above when it is used by another Blender instance",
+        min=1,
+        max=100,
+        default=10,
+        update=updateServerPort
+    )
+
     disp_type: EnumProperty(
         items=disp_types,
         name="Displacement Mode",
@@ -85,10 +137,107 @@ class MSLiveLinkPrefs(AddonPreferences):
         default=False
     )
     
+    lod_policy: EnumProperty(
+        items=lod_policies,
+        name="LOD Import",
+        description="Choose which LODs of 3D assets are imported",
+        default="HIGHEST"
+    )
+
+    lod_level: IntProperty(
+        name="LOD",
+        min=0,
+        max=8,
+        default=0
+    )
+
+    use_proxy_textures: BoolProperty(
+        name="Use Proxy Textures",
+        description="Use downscaled textures in the viewport, full resolution textures are used for command line and scripted renders",
+        default=False
+    )
+
+    proxy_full_resolution: BoolProperty(
+        name="Full Resolution",
+        description="Use the full resolution textures instead of the proxies, enable it before rendering with F12",
+        default=False,
+        update=updateProxyResolution
+    )
+
+    proxy_size: EnumProperty(
+        items=proxy_sizes,
+        name="Proxy Size",
+        default="1024"
+    )
+
+    pack_scalar_maps: BoolProperty(
+        name="Pack Scalar Maps",
+        description="Combine up to three grayscale maps (roughness, metalness, fuzz, opacity, bump, cavity) into the channels of one RGB texture to save texture memory",
+        default=False
+    )
+
+    use_instancing: BoolProperty(
+        name="Instance Repeated 3D Assets",
+        description="Import the geometry of a 3D asset once into a hidden collection and add collection instances for further imports of the same asset",
+        default=False
+    )
+
+    progressive_import: BoolProperty(
+        name="Progressive Import",
+        description="Show assets right away with their lightest LOD and preview textures, the full resolution maps and LODs are loaded over the next moments",
+        default=False
+    )
+
+    batch_threshold: IntProperty(
+        name="Batch Import Threshold",
+        description="Exports with at least this many assets are imported into their own collection as a single undo step, faster for large exports. "
+                    "The collection stays hidden until the whole export is imported, and the first asset waits for the threshold to be reached "
+                    "or the export to be received (0 to disable)",
+        min=0,
+        default=0
+    )
+
+    decoded_cache_dir: StringProperty(
+        name="Decoded Texture Cache",
+        description="Folder where 8 bit JPG and PNG maps are kept converted to uncompressed TGA files so they load faster (empty to disable)",
+        subtype='DIR_PATH',
+        default=""
+    )
+
+    decoded_cache_size: IntProperty(
+        name="Cache Size (MB)",
+        description="The least recently used files of the decoded texture cache are deleted above this size",
+        min=64,
+        default=8192
+    )
+
+    texture_budget: IntProperty(
+        name="Texture Budget (MB)",
+        description="Release the least recently used Megascans textures once their decoded size goes over this budget (0 to disable)",
+        min=0,
+        default=0
+    )
+
+    enable_timings: BoolProperty(
+        name="Record Import Timings",
+        description="Measure every import stage and show the results in the Megascans sidebar panel",
+        default=False
+    )
+
+    timings_log_path: StringProperty(
+        name="Timing Log",
+        description="Optional JSON-lines file the import timings are appended to",
+        subtype='FILE_PATH',
+        default=""
+    )
+
     def draw(self, context):
         layout=self.layout
         col = layout.column()
         row = col.row()
+        row.prop(self, "port")
+        row.prop(self, "port_range")
+        row = col.row()
         row.prop(self, "disp_type")
         if(self.disp_type=="TEXTURE"):
             row.prop(self, "disp_level_texture")
@@ -96,493 +245,2070 @@ class MSLiveLinkPrefs(AddonPreferences):
             row.prop(self, "disp_level_vertex")
         col.prop(self, "is_cavity_enabled")
         col.prop(self, "is_bump_enabled")
+        row = col.row()
+        row.prop(self, "lod_policy")
+        if(self.lod_policy=="FIXED"):
+            row.prop(self, "lod_level")
+        row = col.row()
+        row.prop(self, "use_proxy_textures")
+        if(self.use_proxy_textures):
+            row.prop(self, "proxy_size")
+            row.prop(self, "proxy_full_resolution")
+        col.prop(self, "pack_scalar_maps")
+        col.prop(self, "use_instancing")
+        col.prop(self, "progressive_import")
+        col.prop(self, "batch_threshold")
+        col.prop(self, "texture_budget")
+        row = col.row()
+        row.prop(self, "decoded_cache_dir")
+        if(self.decoded_cache_dir):
+            row.prop(self, "decoded_cache_size")
+        row = col.row()
+        row.prop(self, "enable_timings")
+        if(self.enable_timings):
+            row.prop(self, "timings_log_path")
+        col.operator(MS_BuildMetadataIndex.bl_idname, icon='FILE_FOLDER')
 
 
-class MS_Init_ImportProcess():
+# MS_ImportTimings collects lightweight timing spans for every stage of an import,
+# from the socket receive to the node building, with per-map and per-mesh details.
+# The records of the last imports are kept in memory for the timings panel and can
+# also be appended to a JSON-lines file. When disabled, span() returns a shared
+# no-op context manager so the instrumentation costs next to nothing.
+class MS_ImportTimings():
+
+    maxRecords = 50
 
     def __init__(self):
-    # This initialization method create the data structure to process our assets
-    # later on in the initImportProcess method. The method loops on all assets
-    # that have been sent by Bridge.
+        self.enabled = False
+        self.logPath = ""
+        self.records = collections.deque(maxlen=self.maxRecords)
+        self.current = None
+        self.disabledSpan = contextlib.nullcontext()
+
+    def configure(self, prefs):
+        self.enabled = prefs.enable_timings
+        self.logPath = bpy.path.abspath(prefs.timings_log_path) if prefs.timings_log_path else ""
+
+    # stamps holds the perf_counter times measured on the socket thread for this asset.
+    def begin(self, assetName, stamps=None):
+        if not self.enabled:
+            self.current = None
+            return
+        self.current = {"asset": assetName, "time": time.time(), "stages": []}
+        if stamps:
+            now = time.perf_counter()
+            self.add("receive", None, stamps["received"] - stamps["connected"])
+            self.add("parse", None, stamps["parse"])
+            self.add("queue wait", None, now - stamps["received"])
+
+    def span(self, stage, detail=None):
+        if self.current is None:
+            return self.disabledSpan
+        return MS_TimingSpan(self, stage, detail)
+
+    def add(self, stage, detail, seconds):
+        if self.current is not None:
+            self.current["stages"].append([stage, detail, round(seconds * 1000, 3)])
+
+    def end(self):
+        record = self.current
+        if record is None:
+            return
+        self.current = None
+        self.records.append(record)
+        if self.logPath:
+            try:
+                with open(self.logPath, 'a') as fl_:
+                    fl_.write(json.dumps(record) + "\n")
+            except Exception as e:
+                print( "Megascans LiveLink Error writing the timing log. Error: ", str(e) )
+
+    # Total time of each stage of a record, details merged, in order of appearance.
+    def summarize(self, record):
+        totals = collections.OrderedDict()
+        for stage, detail, milliseconds in record["stages"]:
+            totals[stage] = totals.get(stage, 0) + milliseconds
+        return totals
+
+class MS_TimingSpan():
+
+    def __init__(self, timings, stage, detail):
+        self.timings = timings
+        self.stage = stage
+        self.detail = detail
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.timings.add(self.stage, self.detail, time.perf_counter() - self.start)
+
+Megascans_Timings = MS_ImportTimings()
+
+
+# MS_ImageCache keeps track of the image datablocks created by the LiveLink.
+# Images are keyed by their normalized path and reused as long as the file on disk
+# keeps the same modification time and size, so re-exports and surfaces sharing
+# the same maps do not create duplicated datablocks (foo.jpg.001, ...).
+class MS_ImageCache():
 
-        print("Initialized import class...")
+    def __init__(self):
+        # normalized path -> (image name, (mtime, size))
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def normalizePath(self, imgPath):
+        return os.path.normcase(os.path.abspath(imgPath.replace("\\", "/")))
+
+    def load(self, imgPath):
+        key = self.normalizePath(imgPath)
+        stat_ = os.stat(imgPath)
+        signature = (stat_.st_mtime, stat_.st_size)
+
+        entry = self.entries.get(key)
+        if entry is not None:
+            image = bpy.data.images.get(entry[0])
+            # The datablock may have been removed or renamed by the user since. Proxied
+            # images keep their proxy path while they point to the full resolution file.
+            if image is not None and self.normalizePath(bpy.path.abspath(image.get("MSLiveLink_ProxyPath", image.filepath))) == key:
+                if entry[1] != signature:
+                    # The file changed on disk, reload the pixels in place.
+                    image.reload()
+                    self.entries[key] = (image.name, signature)
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                return image
+
+        image = bpy.data.images.load(imgPath)
+        self.entries[key] = (image.name, signature)
+        self.misses += 1
+        return image
+
+    # Setting the color space frees the image buffers, so a reused image is only updated when it differs.
+    def setColorSpace(self, image, colorSpace):
+        if image.colorspace_settings.name != colorSpace:
+            image.colorspace_settings.name = colorSpace
+
+    # Registers an image that was created before, e.g. in a previous session, for its file state.
+    def adopt(self, imgPath, image, signature):
+        self.entries.setdefault(self.normalizePath(imgPath), (image.name, tuple(signature)))
+
+    # Thread safe check used by the prefetcher, it does not touch bpy data.
+    def isCurrent(self, key, signature):
+        entry = self.entries.get(key)
+        return entry is not None and entry[1] == signature
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def report(self):
+        return "Megascans LiveLink image cache: %d hits, %d misses, %d images" % (self.hits, self.misses, len(self.entries))
+
+Megascans_ImageCache = MS_ImageCache()
+
+
+# MS_TextureBudget tracks the images loaded by the LiveLink with their last use, so
+# their memory can be released once it goes over the budget set in the preferences.
+# Images without users (e.g. left over by deleted assets) are removed first, the
+# least recently used ones, then the pixel buffers of the least recently used images
+# still in use are freed, Blender reloads them from disk when they are needed again.
+class MS_TextureBudget():
+
+    enforceInterval = 5.0
+
+    def __init__(self):
+        # image name -> last use time
+        self.lastUse = {}
+        self.lastEnforce = 0
+        self.removed = 0
+        self.freed = 0
+
+    def touch(self, image):
+        self.lastUse[image.name] = time.time()
+
+    # Returns the tracked images still in the file, least recently used first.
+    def images(self):
+        images = []
+        for name, lastUse in list(self.lastUse.items()):
+            image = bpy.data.images.get(name)
+            if image is None:
+                del self.lastUse[name]
+            else:
+                images.append( (lastUse, image) )
+        images.sort(key=lambda item: item[0])
+        return [image for lastUse, image in images]
+
+    # Memory of the decoded pixels, images that are not loaded take none.
+    def imageBytes(self, image):
+        if not image.has_data:
+            return 0
+        return image.size[0] * image.size[1] * image.channels * (4 if image.is_float else 1)
+
+    def usage(self):
+        images = self.images()
+        return len(images), sum(self.imageBytes(image) for image in images)
+
+    def enforce(self, budgetMB, force=False):
+        if budgetMB <= 0 or (not force and time.time() - self.lastEnforce < self.enforceInterval):
+            return
+        self.lastEnforce = time.time()
+
+        images = self.images()
+        budget = budgetMB * 1024 * 1024
+        total = sum(self.imageBytes(image) for image in images)
+        if total <= budget:
+            return
+
+        for image in [image for image in images if image.users == 0]:
+            if total <= budget:
+                return
+            total -= self.imageBytes(image)
+            del self.lastUse[image.name]
+            bpy.data.images.remove(image)
+            self.removed += 1
+
+        for image in images:
+            if total <= budget:
+                return
+            if image.users > 0 and image.has_data:
+                total -= self.imageBytes(image)
+                image.buffers_free()
+                self.freed += 1
+
+    def clear(self):
+        self.lastUse.clear()
+
+Megascans_TextureBudget = MS_TextureBudget()
+
+
+# MS_MetadataCache holds the few fields we use from the <assetID>.json file of each
+# asset, keyed by the json path and checked against its mtime and size. The cache is
+# kept in memory and persisted in the Blender config folder, and MS_BuildMetadataIndex
+# can prebuild it for a whole Megascans library.
+class MS_MetadataCache():
+
+    def __init__(self):
+        # normalized json path -> {"state": [mtime, size], "averageColors": {...}, "maps": [...], "physicalSize": ...}
+        self.entries = None
+        self.dirty = False
+        self.lock = threading.Lock()
+        # Held while the cache file is written, save is called from the index thread and the timer.
+        self.saveLock = threading.Lock()
+
+    def cacheFile(self):
+        return os.path.join(bpy.utils.user_resource('CONFIG', path="MSLiveLink", create=True), "metadata_cache.json")
+
+    def ensureLoaded(self):
+        with self.lock:
+            if self.entries is not None:
+                return
+            self.entries = {}
         try:
-            # Check if there's any incoming data
-            if globals()['Megascans_DataSet'] != None:
-                self.json_Array = json.loads(globals()['Megascans_DataSet'])
-
-                # Start looping over each asset in the self.json_Array list
-                for js in self.json_Array:
-
-                    self.json_data = js
-
-                    self.selectedObjects = []
-
-                    self.assetType = self.json_data["type"]
-                    self.assetPath = self.json_data["path"]
-                    self.assetID = self.json_data["id"]
-                    self.isMetal = bool(self.json_data["category"] == "Metal") 
-
-                    baseTextures = ["albedo", "displacement", "normal", "roughness",
-                                    "specular", "normalbump", "ao", "opacity",
-                                    "translucency", "gloss", "metalness", "bump", "fuzz", "cavity"]
-
-                    # Create a list of tuples of all the textures maps available.
-                    # This tuple is composed of (textureFormat, textureMapType, texturePath)
-                    self.textureList = []
-                    for obj in self.json_data["components"]:
-                        if obj["type"] in baseTextures:
-                            self.textureList.append( (obj["format"], obj["type"], obj["path"]) )
-
-                    # Create a tuple list of all the 3d meshes  available.
-                    # This tuple is composed of (meshFormat, meshPath)
-                    self.geometryList = [(obj["format"], obj["path"]) for obj in self.json_data["meshList"]]
-
-                    # Create name of our asset. Multiple conditions are set here
-                    # in order to make sure the asset actually has a name and that the name
-                    # is short enough for us to use it. We compose a name with the ID otherwise.
-                    if "name" in self.json_data.keys():
-                        self.assetName = self.json_data["name"].replace(" ", "_")
-                    else:
-                        self.assetName = os.path.basename(self.json_data["path"]).replace(" ", "_")
-                    if len(self.assetName.split("_")) > 2:
-                        self.assetName = "_".join(self.assetName.split("_")[:-1])
+            with open(self.cacheFile(), 'r') as fl_:
+                entries = json.load(fl_)
+            with self.lock:
+                for key, entry in entries.items():
+                    self.entries.setdefault(key, entry)
+        except (IOError, ValueError):
+            pass
 
-                    self.materialName = self.assetName + '_' + self.assetID
+    def get(self, assetPath, assetID):
+        return self.getFile(os.path.join(assetPath, assetID + ".json"))
+
+    def getFile(self, jsonPath):
+        self.ensureLoaded()
+        key = os.path.normcase(os.path.abspath(jsonPath))
+        stat_ = os.stat(jsonPath)
+        state = [stat_.st_mtime, stat_.st_size]
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is not None and entry["state"] == state:
+            return entry
+
+        with open(jsonPath, 'r') as fl_:
+            entry = self.extract(json.load(fl_), state)
+        with self.lock:
+            self.entries[key] = entry
+            self.dirty = True
+        return entry
+
+    # Keeps only the fields the import needs from the asset json.
+    def extract(self, assetJson, state):
+        targetJson = assetJson.get("maps", assetJson.get("components", []))
+        averageColors = {}
+        for item in targetJson:
+            if "averageColor" in item and item.get("type") not in averageColors:
+                averageColors[item["type"]] = item["averageColor"]
+        return {
+            "state": state,
+            "averageColors": averageColors,
+            "maps": sorted(set(item.get("type") for item in targetJson if item.get("type"))),
+            "physicalSize": assetJson.get("physicalSize")
+        }
+
+    def save(self):
+        with self.saveLock:
+            with self.lock:
+                if not self.dirty or self.entries is None:
+                    return
+                data = json.dumps(self.entries)
+                self.dirty = False
+            try:
+                cacheFile = self.cacheFile()
+                with open(cacheFile + ".tmp", 'w') as fl_:
+                    fl_.write(data)
+                os.replace(cacheFile + ".tmp", cacheFile)
+            except Exception as e:
+                with self.lock:
+                    self.dirty = True
+                print( "Megascans LiveLink Error saving the metadata cache. Error: ", str(e) )
+
+    # Indexes every <assetID>.json found under a library folder, returns the number of assets.
+    def indexLibrary(self, libraryPath):
+        count = 0
+        for root, dirs, files in os.walk(libraryPath):
+            dirs[:] = [d for d in dirs if d != MS_ProxyTextures.cacheFolder]
+            for name in files:
+                # Bridge names the asset json after the asset id, which is also the folder suffix.
+                if name.endswith(".json") and os.path.basename(root).endswith(name[:-5]):
+                    try:
+                        self.getFile(os.path.join(root, name))
+                        count += 1
+                    except Exception as e:
+                        print( "Megascans LiveLink Error indexing " + name + ". Error: ", str(e) )
+        self.save()
+        return count
 
-                    # Commented these lines, but you can use this to load the json data of a specific
-                    # asset and retrieve information like tags, real-world size, scanning location, etc...
-                    with open(os.path.join( self.assetPath, (self.assetID + ".json" ) ), 'r') as fl_:
-                        self.assetJson =  json.load(fl_)
+Megascans_MetadataCache = MS_MetadataCache()
 
-                    # Initialize the import method to start building our shader and import our geometry
-                    self.initImportProcess()
-                    print("Imported asset from " + self.assetName + " Quixel Bridge")
 
-        except Exception as e:
-            print( "Megascans LiveLink Error initializing the import process. Error: ", str(e) )
+# MS_ProxyTextures builds downscaled copies of the texture maps in a cache folder
+# next to the asset, so the viewport and Octane interactive preview only hold small
+# images. The full resolution files are swapped in from the preferences, or by the
+# render handlers for renders running on the main thread (command line and scripted
+# renders) and the proxies are restored once the render is done. F12 renders run the
+# handlers on the render thread, where image datablocks must not be changed.
+class MS_ProxyTextures():
 
+    cacheFolder = "MSLiveLink_Cache"
+    fileFormats = {".jpg": 'JPEG', ".jpeg": 'JPEG', ".png": 'PNG', ".exr": 'OPEN_EXR', ".tif": 'TIFF', ".tiff": 'TIFF'}
 
-        globals()['Megascans_DataSet'] = None
-    # this method is used to import the geometry and create the material setup.
-    def initImportProcess(self):
+    def __init__(self):
+        self.fullResolution = False
+        # (normalized path, size) -> mtime of the maps that need no downscaled copy
+        self.unscaled = {}
+
+    def cacheDir(self, imgPath):
+        return os.path.join(os.path.dirname(imgPath), self.cacheFolder)
+
+    def proxyPath(self, imgPath, size, suffix="proxy"):
+        name, ext = os.path.splitext(os.path.basename(imgPath))
+        if ext.lower() not in self.fileFormats:
+            ext = ".png"
+        return os.path.join(self.cacheDir(imgPath), "%s_%s%d%s" % (name, suffix, size, ext))
+
+    # Returns a copy of the map downscaled to size in the cache folder, or the map
+    # itself when it is already small enough.
+    def resample(self, imgPath, size, suffix="proxy"):
+        proxyPath = self.proxyPath(imgPath, size, suffix)
+        mtime = os.path.getmtime(imgPath)
+        if not os.path.isfile(proxyPath) or os.path.getmtime(proxyPath) < mtime:
+            # Maps found to be small enough are not loaded again to check their size.
+            key = (Megascans_ImageCache.normalizePath(imgPath), size)
+            if self.unscaled.get(key) == mtime:
+                return imgPath
+            if not self.build(imgPath, proxyPath, size):
+                self.unscaled[key] = mtime
+                return imgPath
+        return proxyPath
+
+    # Returns the proxy image of a map, or the full resolution image when the map is
+    # already small enough or the proxy cannot be built.
+    def load(self, imgPath, size):
         try:
-            if len(self.textureList) >= 1 and bpy.context.scene.render.engine == 'octane':
-
-                # Import geometry
-                if len(self.geometryList) >= 1:
-                    for obj in self.geometryList:
-                        meshPath = obj[1]
-                        meshFormat = obj[0]
-
-                        if meshFormat.lower() == "fbx":
-                            myOBJ = bpy.ops.import_scene.fbx(filepath=meshPath)
-                            # get selected objects
-                            obj_objects = [ o for o in bpy.context.scene.objects if o.select_get() ]
-                            self.selectedObjects += obj_objects
-
-                        elif meshFormat.lower() == "obj":
-                            myOBJ = bpy.ops.import_scene.obj(filepath=meshPath)
-                            # get selected objects
-                            obj_objects = [ o for o in bpy.context.scene.objects if o.select_get() ]
-                            self.selectedObjects += obj_objects
-
-                # Create material
-                mat = bpy.data.materials.new( self.materialName )
+            proxyPath = self.resample(imgPath, size)
+        except Exception as e:
+            print( "Megascans LiveLink Error building proxy texture. Error: ", str(e) )
+            return Megascans_ImageCache.load(imgPath)
+        if proxyPath == imgPath:
+            return Megascans_ImageCache.load(imgPath)
+
+        image = Megascans_ImageCache.load(proxyPath)
+        image["MSLiveLink_FullPath"] = imgPath
+        image["MSLiveLink_ProxyPath"] = proxyPath
+        if self.fullResolution and image.filepath != imgPath:
+            image.filepath = imgPath
+        return image
+
+    def build(self, imgPath, proxyPath, size):
+        source = bpy.data.images.load(imgPath)
+        try:
+            width, height = source.size
+            scale = size / max(width, height, 1)
+            if scale >= 1:
+                return False
+            os.makedirs(os.path.dirname(proxyPath), exist_ok=True)
+            source.scale(max(1, round(width * scale)), max(1, round(height * scale)))
+            source.filepath_raw = proxyPath
+            source.file_format = self.fileFormats.get(os.path.splitext(proxyPath)[1].lower(), 'PNG')
+            source.save()
+            return True
+        finally:
+            bpy.data.images.remove(source)
+
+    # Points every proxied image to its full resolution file, or back to its proxy.
+    # Images of a file saved in the other state are switched as well.
+    def useFullResolution(self, fullResolution):
+        self.fullResolution = fullResolution
+        for image in bpy.data.images:
+            fullPath = image.get("MSLiveLink_FullPath")
+            if fullPath is None:
+                continue
+            targetPath = fullPath if fullResolution else image["MSLiveLink_ProxyPath"]
+            if image.filepath != targetPath:
+                image.filepath = targetPath
+
+Megascans_ProxyTextures = MS_ProxyTextures()
+
+@persistent
+def proxyRenderPreHandler(scene):
+    if threading.current_thread() is not threading.main_thread():
+        return
+    try:
+        Megascans_ProxyTextures.useFullResolution(True)
+    except Exception as e:
+        print( "Megascans LiveLink Error loading full resolution textures. Error: ", str(e) )
+
+@persistent
+def proxyRenderPostHandler(scene):
+    if threading.current_thread() is not threading.main_thread():
+        return
+    try:
+        Megascans_ProxyTextures.useFullResolution(bpy.context.preferences.addons[__name__].preferences.proxy_full_resolution)
+    except Exception as e:
+        print( "Megascans LiveLink Error restoring proxy textures. Error: ", str(e) )
+
+
+# MS_PackedTextures combines grayscale maps of an asset into the channels of one RGB
+# image, so Octane holds a single texture instead of up to three. Alpha is left
+# opaque, a data map there could get premultiplied into the other channels. The
+# packed files are written to the cache folder next to the maps, their name carries
+# a hash of the source paths and mtimes so a changed map produces a new file. The
+# material reads each map back from its channel through an Octane channel picker node.
+class MS_PackedTextures():
+
+    # Maps that only carry one channel of data. Specular is left out because it is
+    # color managed and displacement because it needs more than 8 bits per channel.
+    packableMaps = ["roughness", "metalness", "fuzz", "opacity", "bump", "cavity"]
+    channels = ("Red", "Green", "Blue")
+
+    def __init__(self):
+        self.supported = None
+
+    # Octane builds without the channel picker node fall back to separate maps.
+    def isSupported(self):
+        if self.supported is None:
+            mat = bpy.data.materials.new(".MS_ChannelPickerProbe")
+            try:
                 mat.use_nodes = True
-                nodes = mat.node_tree.nodes
+                pickNode = mat.node_tree.nodes.new('ShaderNodeOctChannelPickerTex')
+                pickNode.inputs['Channel'].default_value = self.channels[0]
+                pickNode.inputs['Texture']
+                self.supported = numpy is not None
+            except Exception as e:
+                print( "Megascans LiveLink channel picker not available, scalar maps are not packed. Error: ", str(e) )
+                self.supported = False
+            finally:
+                bpy.data.materials.remove(mat)
+        return self.supported
+
+    # Splits the packable maps into groups of up to three, a lone map is not worth packing.
+    def groups(self, mapTypes):
+        size = len(self.channels)
+        scalarMaps = [mapType for mapType in self.packableMaps if mapType in mapTypes]
+        groups = [tuple(scalarMaps[i:i+size]) for i in range(0, len(scalarMaps), size)]
+        return [group for group in groups if len(group) > 1]
+
+    def packPath(self, imgPaths):
+        states = [[os.path.getmtime(imgPath), os.path.getsize(imgPath)] for imgPath in imgPaths]
+        key = zlib.crc32(json.dumps([imgPaths, states]).encode('utf-8'))
+        name = os.path.splitext(os.path.basename(imgPaths[0]))[0]
+        return os.path.join(Megascans_ProxyTextures.cacheDir(imgPaths[0]), "%s_packed%d_%08x.png" % (name, len(imgPaths), key))
+
+    # Returns the packed image file of the given maps, building it when needed.
+    def pack(self, imgPaths):
+        packPath = self.packPath(imgPaths)
+        if os.path.isfile(packPath):
+            return packPath
+
+        # The maps are loaded one by one, each freed before the next one is loaded, and
+        # scaled to the size of the first one. They are read into the same float buffer
+        # and their channel is kept as 8 bits, the buffer is reused again to write the
+        # packed image.
+        width = height = None
+        for channel, imgPath in enumerate(imgPaths):
+            source = bpy.data.images.load(imgPath)
+            try:
+                if width is None:
+                    width, height = source.size
+                    buffer = numpy.empty(width * height * 4, dtype=numpy.float32)
+                    pixels = numpy.full((width * height, 4), 255, dtype=numpy.uint8)
+                elif tuple(source.size) != (width, height):
+                    source.scale(width, height)
+                sourceBuffer = buffer[:width * height * source.channels]
+                self.readPixels(source, sourceBuffer)
+                values = sourceBuffer[0::source.channels]
+                values *= 255
+                values += 0.5
+                numpy.clip(values, 0, 255, out=values)
+                pixels[:, channel] = values
+            finally:
+                bpy.data.images.remove(source)
+
+        os.makedirs(os.path.dirname(packPath), exist_ok=True)
+        packed = bpy.data.images.new(os.path.basename(packPath), width, height, alpha=False)
+        try:
+            numpy.multiply(pixels.ravel(), 1 / 255, out=buffer, casting='unsafe')
+            self.writePixels(packed, buffer)
+            packed.filepath_raw = packPath
+            packed.file_format = 'PNG'
+            packed.save()
+        finally:
+            bpy.data.images.remove(packed)
+
+        # Packs built from previous versions of the maps are not used anymore.
+        prefix = os.path.basename(packPath)[:-13]
+        for name in os.listdir(os.path.dirname(packPath)):
+            if name.startswith(prefix) and name != os.path.basename(packPath):
+                os.remove(os.path.join(os.path.dirname(packPath), name))
+        return packPath
+
+    # foreach_get/foreach_set on image pixels only exist from Blender 2.83.
+    def readPixels(self, image, buffer):
+        if hasattr(image.pixels, "foreach_get"):
+            image.pixels.foreach_get(buffer)
+        else:
+            buffer[:] = image.pixels[:]
 
-                # replace default octane shader with a universal shader
-                outNode = nodes[0]
-                oldMainMat = nodes[1]
-                mainMat = nodes.new('ShaderNodeOctUniversalMat')
-                mainMat.location = oldMainMat.location
-                nodes.remove(oldMainMat)
-                mat.node_tree.links.new(outNode.inputs['Surface'], mainMat.outputs[0])
+    def writePixels(self, image, buffer):
+        if hasattr(image.pixels, "foreach_set"):
+            image.pixels.foreach_set(buffer)
+        else:
+            image.pixels[:] = buffer.tolist()
 
-                # iterate through all objects
-                for obj in self.selectedObjects:
-                    # assign material to obj
-                    obj.active_material = mat
+Megascans_PackedTextures = MS_PackedTextures()
 
-                # Get a list of all available texture maps. item[1] returns the map type (albedo, normal, etc...).
-                maps_ = [item[1] for item in self.textureList]
-                colorSpaces = ["sRGB", "Linear"]
 
-                mainMat.inputs['Metallic'].default_value = 1 if self.isMetal else 0 # Metallic value
-                mainMat.inputs['Dielectric IOR'].default_value = 1.52 # IOR Value
-                mainMat.inputs['Specular'].default_value = 0.5
+# MS_DecodedCache keeps copies of the 8 bit JPG and PNG maps converted to uncompressed TGA
+# files in the directory set in the preferences, so the maps of libraries imported
+# over and over are decoded only once. Entries are named after a hash of the source
+# content, computed by the prefetcher while it reads the file, and touched on every
+# use. The least recently used entries are deleted once the cache goes over its size
+# limit, except the files still loaded in Blender.
+class MS_DecodedCache():
 
-                y_exp = 310
+    convertedFormats = (".jpg", ".jpeg", ".png")
+    extension = ".tga"
 
-                prefs = bpy.context.preferences.addons[__name__].preferences
+    def __init__(self):
+        self.directory = None
+        self.maxBytes = 0
+        self.lock = threading.Lock()
+        # normalized path -> ((mtime, size), content hash)
+        self.hashes = {}
+        # Content hashes of the maps that are not converted, e.g. 16 bit PNG.
+        self.unconverted = set()
+
+    def configure(self, prefs):
+        self.directory = bpy.path.abspath(prefs.decoded_cache_dir) if prefs.decoded_cache_dir else None
+        self.maxBytes = prefs.decoded_cache_size * 1024 * 1024
+
+    def accepts(self, imgPath):
+        return self.directory is not None and os.path.splitext(imgPath)[1].lower() in self.convertedFormats
+
+    # Thread safe, called by the prefetcher with the hash of the content it read.
+    def storeHash(self, key, signature, digest):
+        with self.lock:
+            self.hashes[key] = (signature, digest)
+
+    def contentHash(self, imgPath):
+        key = Megascans_ImageCache.normalizePath(imgPath)
+        stat_ = os.stat(imgPath)
+        signature = (stat_.st_mtime, stat_.st_size)
+        with self.lock:
+            entry = self.hashes.get(key)
+        if entry is not None and entry[0] == signature:
+            return entry[1]
+
+        hasher = hashlib.sha1()
+        with open(imgPath, 'rb') as file_:
+            for chunk in iter(lambda: file_.read(Megascans_Prefetcher.chunkSize), b''):
+                hasher.update(chunk)
+        self.storeHash(key, signature, hasher.hexdigest())
+        return hasher.hexdigest()
+
+    # Returns the converted copy of a map, converting it the first time it is seen,
+    # or the map itself when it is not cached.
+    def resolve(self, imgPath):
+        if not self.accepts(imgPath):
+            return imgPath
+        try:
+            digest = self.contentHash(imgPath)
+            if digest in self.unconverted:
+                return imgPath
+            cachedPath = os.path.join(self.directory, digest + self.extension)
+            if os.path.isfile(cachedPath):
+                os.utime(cachedPath, None)
+            elif self.convert(imgPath, cachedPath):
+                self.cleanup(cachedPath)
+            else:
+                self.unconverted.add(digest)
+                return imgPath
+            return cachedPath
+        except Exception as e:
+            print( "Megascans LiveLink Error using the decoded texture cache. Error: ", str(e) )
+            return imgPath
 
-                # Create the albedo setup.
-                if "albedo" in maps_:
-
-                    imgPath = [item[2] for item in self.textureList if item[1] == "albedo"]
-                    if len(imgPath) >= 1:
-                        imgPath = imgPath[0].replace("\\", "/")
-
-                        texNode = nodes.new('ShaderNodeOctImageTex')
-                        y_exp += -320
-                        texNode.location = (-720, y_exp)
-                        texNode.image = bpy.data.images.load(imgPath)
-                        texNode.show_texture = True
-                        texNode.image.colorspace_settings.name = colorSpaces[0]
-
-                        mat.node_tree.links.new(mainMat.inputs['Albedo color'], texNode.outputs[0])
-
-                # Create the roughness setup.
-                if "roughness" in maps_:
-
-                    imgPath = [item[2] for item in self.textureList if item[1] == "roughness"]
-                    if len(imgPath) >= 1:
-                        imgPath = imgPath[0].replace("\\", "/")
-
-                        texNode = nodes.new('ShaderNodeOctImageTex')
-                        y_exp += -320
-                        texNode.location = (-720, y_exp)
-                        texNode.image = bpy.data.images.load(imgPath)
-                        texNode.show_texture = True
-                        texNode.image.colorspace_settings.name = colorSpaces[1]
-
-                        mat.node_tree.links.new(mainMat.inputs['Roughness'], texNode.outputs[0])
-
-                # Create the fuzziness setup.
-                if "fuzz" in maps_:
-
-                    imgPath = [item[2] for item in self.textureList if item[1] == "fuzz"]
-                    if len(imgPath) >= 1:
-                        imgPath = imgPath[0].replace("\\", "/")
-
-                        texNode = nodes.new('ShaderNodeOctImageTex')
-                        y_exp += -320
-                        texNode.location = (-720, y_exp)
-                        texNode.image = bpy.data.images.load(imgPath)
-                        texNode.show_texture = True
-                        texNode.image.colorspace_settings.name = colorSpaces[1]
-
-                        mat.node_tree.links.new(mainMat.inputs['Sheen'], texNode.outputs[0])
-                        mainMat.inputs['Sheen Roughness'].default_value = 0
-
-                # Create the metalness setup
-                if "metalness" in maps_:
-
-                    imgPath = [item[2] for item in self.textureList if item[1] == "metalness"]
-                    if len(imgPath) >= 1:
-                        imgPath = imgPath[0].replace("\\", "/")
-
-                        texNode = nodes.new('ShaderNodeOctImageTex')
-                        y_exp += -320
-                        texNode.location = (-720, y_exp)
-                        texNode.image = bpy.data.images.load(imgPath)
-                        texNode.show_texture = True
-                        texNode.image.colorspace_settings.name = colorSpaces[1]
-
-                        mat.node_tree.links.new(mainMat.inputs['Metallic'], texNode.outputs[0])
-
-                # Create the displacement setup.
-                if "displacement" in maps_:
-                    
-                    imgPath = [item[2] for item in self.textureList if item[1] == "displacement"]
-                    if len(imgPath) >= 1:
-                        imgPath = imgPath[0].replace("\\", "/")
-                        texNode = nodes.new('ShaderNodeOctImageTex')
-                        y_exp += -320
-                        texNode.location = (-720, y_exp)
-                        texNode.image = bpy.data.images.load(imgPath)
-                        texNode.show_texture = True
-                        texNode.image.colorspace_settings.name = colorSpaces[1]
-                        if prefs.disp_type == "VERTEX":
-                            texNode.border_mode = 'OCT_BORDER_MODE_CLAMP'
-
-                        if prefs.disp_type == "TEXTURE":
-                            dispNode = nodes.new('ShaderNodeOctDisplacementTex')
-                            dispNode.displacement_level = prefs.disp_level_texture
-                            #dispNode.displacement_filter = 'OCTANE_FILTER_TYPE_BOX'
-                            dispNode.inputs['Mid level'].default_value = 0.5
-                            dispNode.inputs['Height'].default_value = 0.1
-                        else:
-                            dispNode = nodes.new('ShaderNodeOctVertexDisplacementTex')
-                            dispNode.inputs['Auto bump map'].default_value = True
-                            dispNode.inputs['Mid level'].default_value = 0.1
-                            dispNode.inputs['Height'].default_value = 0.1
-                            dispNode.inputs['Subdivision level'].default_value = prefs.disp_level_vertex
+    # TGA only holds 8 bits per channel, maps with more precision (16 bit PNG) are not converted.
+    def convert(self, imgPath, cachedPath):
+        os.makedirs(self.directory, exist_ok=True)
+        source = bpy.data.images.load(imgPath)
+        try:
+            if source.is_float or source.depth > 32:
+                return False
+            # Written under a temporary name so an interrupted save never leaves a valid looking entry.
+            source.filepath_raw = cachedPath + ".part"
+            source.file_format = 'TARGA_RAW'
+            source.save()
+        finally:
+            bpy.data.images.remove(source)
+        os.replace(cachedPath + ".part", cachedPath)
+        return True
+
+    def cleanup(self, keepPath):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(self.extension):
+                stat_ = os.stat(os.path.join(self.directory, name))
+                entries.append( (stat_.st_mtime, stat_.st_size, os.path.join(self.directory, name)) )
+        total = sum(entry[1] for entry in entries)
+        if total <= self.maxBytes:
+            return
+
+        inUse = set(Megascans_ImageCache.normalizePath(bpy.path.abspath(image.filepath)) for image in bpy.data.images)
+        for mtime, size, path in sorted(entries):
+            if total <= self.maxBytes:
+                break
+            if path != keepPath and Megascans_ImageCache.normalizePath(path) not in inUse:
+                os.remove(path)
+                total -= size
+
+Megascans_DecodedCache = MS_DecodedCache()
+
+
+# MS_TexturePrefetcher reads the texture files of incoming assets on a thread pool
+# while the main thread is still busy with previous assets. This warms the OS page
+# cache, so bpy.data.images.load only pays for the decode, and lets us skip missing
+# or corrupt maps before any node is built.
+class MS_TexturePrefetcher():
+
+    # Expected file signatures of the formats shipped by Bridge.
+    signatures = {
+        ".jpg": (b"\xff\xd8\xff",),
+        ".jpeg": (b"\xff\xd8\xff",),
+        ".png": (b"\x89PNG\r\n\x1a\n",),
+        ".exr": (b"\x76\x2f\x31\x01",),
+        ".tif": (b"II*\x00", b"MM\x00*"),
+        ".tiff": (b"II*\x00", b"MM\x00*"),
+    }
+    chunkSize = 1024 * 1024
+
+    def __init__(self, workers=4):
+        self.workers = workers
+        self.executor = None
+        self.futures = {}
+        self.lock = threading.Lock()
+
+    def getExecutor(self):
+        if self.executor is None:
+            self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="MSLiveLinkPrefetch")
+        return self.executor
+
+    # Runs any other preparation work of an asset on the pool.
+    def submit(self, function, *args):
+        with self.lock:
+            return self.getExecutor().submit(function, *args)
+
+    def prefetch(self, paths):
+        with self.lock:
+            self.getExecutor()
+            for path in paths:
+                key = Megascans_ImageCache.normalizePath(path)
+                if key not in self.futures:
+                    self.futures[key] = self.executor.submit(self.readTexture, path, key)
+
+    def readTexture(self, path, key):
+        stat_ = os.stat(path)
+        if stat_.st_size == 0:
+            raise IOError("empty file " + path)
+        # Nothing to warm up if the image datablock is already up to date.
+        if Megascans_ImageCache.isCurrent(key, (stat_.st_mtime, stat_.st_size)):
+            return stat_.st_size
+
+        # The content hash used by the decoded texture cache is computed on the way.
+        hasher = hashlib.sha1() if Megascans_DecodedCache.accepts(path) else None
+        buffer_ = bytearray(self.chunkSize)
+        view = memoryview(buffer_)
+        with open(path, 'rb') as file_:
+            read = file_.readinto(buffer_)
+            expected = self.signatures.get(os.path.splitext(path)[1].lower())
+            if expected and not any(buffer_[:len(sig)] == sig for sig in expected):
+                raise IOError("unexpected file signature for " + path)
+            total = read
+            while read:
+                if hasher is not None:
+                    hasher.update(view[:read])
+                read = file_.readinto(buffer_)
+                total += read
+        if total != stat_.st_size:
+            raise IOError("truncated file " + path)
+        if hasher is not None:
+            Megascans_DecodedCache.storeHash(key, (stat_.st_mtime, stat_.st_size), hasher.hexdigest())
+        return total
+
+    # Waits for the prefetch of a texture and returns False if the file cannot be used.
+    def isValid(self, path):
+        with self.lock:
+            future = self.futures.pop(Megascans_ImageCache.normalizePath(path), None)
+        if future is None:
+            return os.path.isfile(path)
+        try:
+            future.result()
+            return True
+        except Exception as e:
+            print( "Megascans LiveLink skipping texture. Error: ", str(e) )
+            return False
 
-                        dispNode.location = (-360, -680)
+    def shutdown(self):
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=False)
+                self.executor = None
+            self.futures.clear()
 
-                        mat.node_tree.links.new(dispNode.inputs['Texture'], texNode.outputs[0])
-                        mat.node_tree.links.new(mainMat.inputs['Displacement'], dispNode.outputs[0])
+Megascans_Prefetcher = MS_TexturePrefetcher()
 
-                # Create the translucency setup.
-                if "translucency" in maps_:
 
-                    imgPath = [item[2] for item in self.textureList if item[1] == "translucency"]
-                    if len(imgPath) >= 1:
-                        imgPath = imgPath[0].replace("\\", "/")
+# MS_MaterialTemplates keeps one template material per map set signature. The first
+# asset of a signature builds its node graph from scratch, later assets copy the
+# template and only swap their images and values.
+class MS_MaterialTemplates():
 
-                        texNode = nodes.new('ShaderNodeOctImageTex')
-                        y_exp += -320
-                        texNode.location = (-720, y_exp)
-                        texNode.image = bpy.data.images.load(imgPath)
-                        texNode.show_texture = True
-                        texNode.image.colorspace_settings.name = colorSpaces[0]
+    def __init__(self):
+        # signature -> template material name
+        self.templates = {}
+
+    def instantiate(self, signature, materialName):
+        templateName = self.templates.get(signature)
+        template = bpy.data.materials.get(templateName) if templateName else None
+        if template is None:
+            return None
+        mat = template.copy()
+        mat.name = materialName
+        return mat
+
+    def store(self, signature, mat):
+        # The template is hidden from the material lists and holds no image.
+        template = mat.copy()
+        template.name = ".MS_Template"
+        for node in template.node_tree.nodes:
+            if node.bl_idname == 'ShaderNodeOctImageTex':
+                node.image = None
+        self.templates[signature] = template.name
+
+    def clear(self):
+        self.templates.clear()
+
+Megascans_MaterialTemplates = MS_MaterialTemplates()
+
+
+# MS_ImportJournal remembers, per scene, which datablocks were created for every
+# assetID along with the state of the source files. It is stored in a scene custom
+# property group holding one JSON string per assetID, so it is saved with the .blend
+# and recording an asset only serializes its own entry. It is kept parsed in memory
+# so a lookup does not depend on the journal size either.
+class MS_ImportJournal():
+
+    propertyName = "MSLiveLink_Journal"
 
-                        scatterNode = nodes.new('ShaderNodeOctScatteringMedium')
-                        scatterNode.inputs['Absorption Tex'].default_value = (1, 1, 1, 1)
-                        scatterNode.inputs['Invert abs.'].default_value = False
-                        scatterNode.location = (-360, -1000)
+    def __init__(self):
+        # scene name -> {assetID: entry}
+        self.journals = {}
+
+    def getJournal(self, scene):
+        journal = self.journals.get(scene.name)
+        if journal is None:
+            journal = {}
+            stored = scene.get(self.propertyName)
+            try:
+                # Journals of previous versions are a single JSON string.
+                if isinstance(stored, str):
+                    journal = json.loads(stored)
+                elif stored is not None:
+                    journal = {assetID: json.loads(text) for assetID, text in stored.items()}
+            except ValueError:
+                journal = {}
+            self.journals[scene.name] = journal
+        return journal
+
+    def get(self, scene, assetID):
+        return self.getJournal(scene).get(assetID)
+
+    def record(self, scene, assetID, entry):
+        journal = self.getJournal(scene)
+        journal[assetID] = entry
+        stored = scene.get(self.propertyName)
+        if stored is None or isinstance(stored, str):
+            scene[self.propertyName] = {key: json.dumps(value) for key, value in journal.items()}
+        else:
+            stored[assetID] = json.dumps(entry)
 
-                        mat.node_tree.links.new(mainMat.inputs['Transmission'], texNode.outputs[0])
-                        mat.node_tree.links.new(mainMat.inputs['Medium'], scatterNode.outputs[0])
+    # (mtime, size) of a source file, compared against the journal to detect changes.
+    def fileState(self, path):
+        stat_ = os.stat(path)
+        return [stat_.st_mtime, stat_.st_size]
 
-                    pass
+    def clear(self):
+        self.journals.clear()
 
-                # Create the opacity setup
-                if "opacity" in maps_:
+Megascans_ImportJournal = MS_ImportJournal()
 
-                    imgPath = [item[2] for item in self.textureList if item[1] == "opacity"]
-                    if len(imgPath) >= 1:
-                        imgPath = imgPath[0].replace("\\", "/")
+# The parsed journals belong to the previous file once another one is loaded.
+@persistent
+def clearJournalHandler(dummy):
+    Megascans_ImportJournal.clear()
+    Megascans_MaterialTemplates.clear()
+    Megascans_TextureBudget.clear()
+    Megascans_Upgrades.clear()
 
-                        texNode = nodes.new('ShaderNodeOctImageTex')
-                        # y_exp += -320
-                        texNode.location = (256, 0)
-                        texNode.image = bpy.data.images.load(imgPath)
-                        texNode.show_texture = True
-                        texNode.image.colorspace_settings.name = colorSpaces[1]
 
-                        mixNode = nodes.new('ShaderNodeOctMixMat')
-                        mixNode.location = (630, 0)
-                        mixNode.inputs['Amount'].default_value = 1
-                        mat.node_tree.links.new(mixNode.inputs['Amount'], texNode.outputs[0])
+# MS_ProgressiveUpgrades holds the remaining steps of progressive imports. The
+# LiveLink timer runs one step per tick whenever no new asset is waiting.
+class MS_ProgressiveUpgrades():
 
-                        transpNode = nodes.new('ShaderNodeOctDiffuseMat')
-                        transpNode.location = (256, -320)
-                        transpNode.inputs['Opacity'].default_value = 0
+    def __init__(self):
+        self.steps = collections.deque()
 
-                        mat.node_tree.links.new(mixNode.inputs['Material1'], mainMat.outputs[0])
-                        mat.node_tree.links.new(mixNode.inputs['Material2'], transpNode.outputs[0])
+    def add(self, function, *args):
+        self.steps.append( (function, args) )
 
-                        mat.node_tree.links.new(outNode.inputs['Surface'], mixNode.outputs[0])
+    def pending(self):
+        return bool(self.steps)
 
-                        mat.blend_method = 'CLIP'
-                        mat.shadow_method = 'CLIP'
+    def runNext(self):
+        function, args = self.steps.popleft()
+        try:
+            function(*args)
+        except Exception as e:
+            print( "Megascans LiveLink Error upgrading a progressive import. Error: ", str(e) )
+
+    def clear(self):
+        self.steps.clear()
+
+Megascans_Upgrades = MS_ProgressiveUpgrades()
+
+
+# MS_AssetRecord is the validated form of an asset element of a Bridge payload. It is
+# built on the socket thread as soon as the element is parsed, so malformed assets are
+# rejected there, and only keeps what the import needs: the texture path of every map
+# type (the first one listed wins) and the (format, path) of every mesh, with forward
+# slashes in the paths.
+class MS_AssetRecord():
+
+    __slots__ = ("assetID", "assetType", "assetPath", "name", "category", "maps", "meshes")
+
+    def __init__(self, asset):
+        if not isinstance(asset, dict):
+            raise ValueError("asset is not a JSON object")
+        for key in ("id", "type", "path"):
+            if not isinstance(asset.get(key), str) or not asset[key]:
+                raise ValueError("asset has no valid '%s'" % key)
+        self.assetID = asset["id"]
+        self.assetType = asset["type"]
+        self.assetPath = asset["path"]
+        self.name = asset.get("name") if isinstance(asset.get("name"), str) and asset.get("name") else None
+        self.category = asset.get("category") if isinstance(asset.get("category"), str) else ""
+
+        components = asset.get("components")
+        meshList = asset.get("meshList", [])
+        if not isinstance(components, list) or not isinstance(meshList, list):
+            raise ValueError("asset %s has no valid components or meshList" % self.assetID)
+
+        self.maps = {}
+        for component in components:
+            if not isinstance(component, dict) or not isinstance(component.get("path"), str):
+                raise ValueError("asset %s has a component without path" % self.assetID)
+            if component.get("type") in MS_Init_ImportProcess.baseTextures:
+                self.maps.setdefault(component["type"], component["path"].replace("\\", "/"))
+
+        self.meshes = []
+        for mesh in meshList:
+            if not isinstance(mesh, dict) or not isinstance(mesh.get("path"), str):
+                raise ValueError("asset %s has a mesh without path" % self.assetID)
+            meshFormat = mesh.get("format") or os.path.splitext(mesh["path"])[1][1:]
+            self.meshes.append( (str(meshFormat).lower(), mesh["path"].replace("\\", "/")) )
 
-                # Create the normal map setup for Redshift.
-                if "normal" in maps_:
-                    
-                    texNode = nodes.new('ShaderNodeOctImageTex')
 
-                    imgPath = [item[2] for item in self.textureList if item[1] == "normal"]
-                    if len(imgPath) >= 1:
-                        imgPath = imgPath[0].replace("\\", "/")
+class MS_Init_ImportProcess():
 
-                        y_exp += -320
-                        texNode.location = (-720, y_exp)
+    baseTextures = ["albedo", "displacement", "normal", "roughness",
+                    "specular", "normalbump", "ao", "opacity",
+                    "translucency", "gloss", "metalness", "bump", "fuzz", "cavity"]
+
+    # Texture maps handled by the material setup, in the order their image nodes are stacked.
+    # (mapType, colorSpace, universal material input, extra setup method, stacked in the node column)
+    materialMaps = [
+        ("albedo", "sRGB", "Albedo color", None, True),
+        ("roughness", "Linear", "Roughness", None, True),
+        ("fuzz", "Linear", "Sheen", "setupFuzz", True),
+        ("metalness", "Linear", "Metallic", None, True),
+        ("displacement", "Linear", None, "setupDisplacement", True),
+        ("translucency", "sRGB", "Transmission", "setupTranslucency", True),
+        ("opacity", "Linear", None, "setupOpacity", False),
+        ("normal", "Linear", "Normal", None, True),
+        ("specular", "sRGB", "Specular", None, True),
+        ("bump", "Linear", None, None, True),
+        ("cavity", "Linear", None, None, True)
+    ]
+
+    # Maps only imported when the given preference is enabled.
+    optionalMaps = {"bump": "is_cavity_enabled", "cavity": "is_cavity_enabled"}
+
+    meshFormats = ["fbx", "obj"]
+    lodPattern = re.compile(r'_LOD(\d+)', re.IGNORECASE)
+
+    # Progressive import: size of the preview images, and maps loaded right away because
+    # the shape of the asset depends on them.
+    previewSize = 512
+    progressiveEagerMaps = ("opacity",)
+    # Preview image Bridge ships in the asset folder, e.g. <assetID>_Preview.png.
+    bridgePreviewPattern = re.compile(r'preview.*\.(png|jpe?g)$', re.IGNORECASE)
+
+    def __init__(self, record, stamps=None):
+    # This initialization method create the data structure to process our asset
+    # later on in the initImportProcess method. It is invoked once for every asset
+    # element of a Bridge payload, usually already validated into an MS_AssetRecord.
+
+        if not isinstance(record, MS_AssetRecord):
+            record = MS_AssetRecord(record)
 
-                        texNode.image = bpy.data.images.load(imgPath)
-                        texNode.show_texture = True
-                        texNode.image.colorspace_settings.name = colorSpaces[1]
+        print("Initialized import class...")
+        Megascans_Timings.configure(bpy.context.preferences.addons[__name__].preferences)
+        Megascans_DecodedCache.configure(bpy.context.preferences.addons[__name__].preferences)
+        Megascans_Timings.begin(record.name or record.assetID, stamps)
+        startTime = time.perf_counter()
+        try:
+            self.record = record
+
+            self.selectedObjects = []
+
+            self.assetType = record.assetType
+            self.assetPath = record.assetPath
+            self.assetID = record.assetID
+            self.isMetal = bool(record.category == "Metal")
+
+            # Texture maps of the asset by map type. Maps that failed the background
+            # prefetch (missing or corrupt files) are left out.
+            with Megascans_Timings.span("prefetch wait"):
+                self.maps = {mapType: path for mapType, path in record.maps.items() if Megascans_Prefetcher.isValid(path)}
+
+            # (meshFormat, meshPath) of all the 3d meshes available.
+            self.geometryList = record.meshes
+
+            # Create name of our asset. Multiple conditions are set here
+            # in order to make sure the asset actually has a name and that the name
+            # is short enough for us to use it. We compose a name with the ID otherwise.
+            if record.name is not None:
+                self.assetName = record.name.replace(" ", "_")
+            else:
+                self.assetName = os.path.basename(record.assetPath).replace(" ", "_")
+            if len(self.assetName.split("_")) > 2:
+                self.assetName = "_".join(self.assetName.split("_")[:-1])
+
+            self.materialName = self.assetName + '_' + self.assetID
+
+            # The fields we need from the json data of the asset (average colors, maps, real-world size)
+            # come from the metadata cache, which is usually warmed up by the prefetcher.
+            try:
+                with Megascans_Timings.span("metadata"):
+                    self.assetMetadata = Megascans_MetadataCache.get(self.assetPath, self.assetID)
+            except Exception as e:
+                print( "Megascans LiveLink Error reading the asset metadata. Error: ", str(e) )
+                self.assetMetadata = None
+
+            # Initialize the import method to start building our shader and import our geometry
+            self.initImportProcess()
+            print("Imported asset from " + self.assetName + " Quixel Bridge")
+            print(Megascans_ImageCache.report())
 
-                        texNode.image.colorspace_settings.name = colorSpaces[1]
-                        mat.node_tree.links.new(mainMat.inputs['Normal'], texNode.outputs[0])
+        except Exception as e:
+            print( "Megascans LiveLink Error initializing the import process. Error: ", str(e) )
 
-                # Create the specular map setup
-                if "specular" in maps_:
-                    texNode = nodes.new('ShaderNodeOctImageTex')
+        Megascans_Timings.add("total", None, time.perf_counter() - startTime)
+        Megascans_Timings.end()
+
+    # Returns the (meshFormat, meshPath, lod) entries to import according to the LOD policy,
+    # most detailed first. Meshes without a LOD suffix are the high poly source (lod -1),
+    # and FBX is preferred over OBJ when a LOD is available in both formats.
+    def selectLods(self, prefs, policy=None):
+        policy = policy or prefs.lod_policy
+        lods = {}
+        for meshFormat, meshPath in self.geometryList:
+            if meshFormat.lower() not in self.meshFormats:
+                continue
+            match = self.lodPattern.search(os.path.basename(meshPath))
+            lod = int(match.group(1)) if match else -1
+            current = lods.get(lod)
+            if current is None or self.meshFormats.index(meshFormat.lower()) < self.meshFormats.index(current[0].lower()):
+                lods[lod] = (meshFormat, meshPath, lod)
+
+        available = [lods[lod] for lod in sorted(lods)]
+        if not available or policy == "ALL":
+            return available
+        if policy == "FIXED":
+            return [min(available, key=lambda item: (abs(item[2] - prefs.lod_level), item[2]))]
+        return available[:1]
+
+    # Import a mesh file into a temporary collection so the new objects can be found
+    # without walking the scene, then move them to the collection that was active.
+    def importGeometry(self, meshFormat, meshPath, targetCollection=None):
+        newObjects = []
+        if meshFormat.lower() not in ("fbx", "obj"):
+            return newObjects
+
+        view_layer = bpy.context.view_layer
+        targetLayer = view_layer.active_layer_collection
+        if targetCollection is None:
+            targetCollection = targetLayer.collection
+        importCollection = bpy.data.collections.new(self.assetName + "_import")
+        # Imports into a collection disabled in the viewport (batch mode) are not evaluated either.
+        importCollection.hide_viewport = targetCollection.hide_viewport
+        bpy.context.scene.collection.children.link(importCollection)
+        try:
+            view_layer.active_layer_collection = view_layer.layer_collection.children[importCollection.name]
+            if meshFormat.lower() == "fbx":
+                bpy.ops.import_scene.fbx(filepath=meshPath)
+            else:
+                bpy.ops.import_scene.obj(filepath=meshPath)
+            newObjects = list(importCollection.objects)
+        finally:
+            view_layer.active_layer_collection = targetLayer
+            for obj in newObjects:
+                targetCollection.objects.link(obj)
+            bpy.data.collections.remove(importCollection)
+        return newObjects
 
-                    imgPath = [item[2] for item in self.textureList if item[1] == "specular"]
-                    if len(imgPath) >= 1:
-                        imgPath = imgPath[0].replace("\\", "/")
+    # this method is used to import the geometry and create the material setup.
+    def initImportProcess(self):
+        try:
+            if self.maps and bpy.context.scene.render.engine == 'octane':
 
-                        y_exp += -320
-                        texNode.location = (-720, y_exp)
+                prefs = bpy.context.preferences.addons[__name__].preferences
+                scene = bpy.context.scene
+
+                # A re-export of an asset already in the .blend reuses its data when the files did not change.
+                entry = Megascans_ImportJournal.get(scene, self.assetID)
+                lods = self.selectLods(prefs)
+                geometryState = [[meshPath] + Megascans_ImportJournal.fileState(meshPath) for meshFormat, meshPath, lod in lods]
+
+                # In instancing mode the geometry of an asset is imported once into a hidden source
+                # collection and every import of the asset adds an instance of that collection.
+                source = None
+                if prefs.use_instancing and lods:
+                    source = self.instanceSource(entry, geometryState)
+                    if source is not None:
+                        self.createInstance(source)
+                        return
+                    source = bpy.data.collections.new("MS_Source_" + self.assetName + "_" + self.assetID)
+                    scene.collection.children.link(source)
+
+                # In progressive mode the lightest LOD and small preview images are shown first,
+                # the LODs of the LOD policy and the full resolution maps are swapped in over
+                # the next timer ticks. Background imports have no timer to run the upgrades.
+                progressive = prefs.progressive_import and not bpy.app.background
+                upgradeLods = None
+
+                with self.importInto(source):
+                    objectStates = None
+                    if entry is not None and entry["geometry"] == geometryState:
+                        objectStates = self.duplicateObjects(entry["objects"])
+
+                    if objectStates is None:
+                        objectStates = []
+                        importLods = lods
+                        if progressive and source is None:
+                            previewLods = self.selectLods(prefs, "ALL")[-1:]
+                            if previewLods != lods[:1] or len(lods) > 1:
+                                importLods, upgradeLods = previewLods, lods
+                        # Import geometry, only the meshes required by the LOD policy are loaded.
+                        for index, (meshFormat, meshPath, lod) in enumerate(importLods):
+                            with Megascans_Timings.span("geometry", os.path.basename(meshPath)):
+                                newObjects = self.importGeometry(meshFormat, meshPath)
+                            for obj in newObjects:
+                                # Additional LODs are kept as hidden variants the user can switch to.
+                                if index > 0:
+                                    obj.hide_set(True)
+                                    obj.hide_render = True
+                                objectStates.append( (obj, index > 0) )
+                self.selectedObjects += [obj for obj, hidden in objectStates]
+
+                # Gather the maps handled by the material setup.
+                maps_ = self.gatherMaps(prefs)
+                mapTypes = tuple(item[0] for item in maps_)
+                specularColor = None if "specular" in mapTypes else self.getSpecularColor()
+                packs = self.packMaps(maps_, prefs)
+                slots = self.imageSlots(maps_, packs, prefs)
+                signature = (mapTypes, specularColor is not None, prefs.disp_type,
+                             prefs.disp_level_texture, prefs.disp_level_vertex,
+                             tuple(group for group, packPath in packs))
+
+                mat = None
+                if entry is not None:
+                    mat = self.reuseMaterial(entry, slots, signature, prefs)
+
+                upgradeImages = []
+                if mat is None:
+                    images = {}
+                    for nodeName, imgPath, colorSpace in slots:
+                        if progressive and nodeName not in [self.imageNodeName(mapType) for mapType in self.progressiveEagerMaps]:
+                            images[nodeName] = self.previewImage(nodeName, imgPath, colorSpace)
+                            upgradeImages.append( (nodeName, imgPath, colorSpace) )
+                        else:
+                            images[nodeName] = self.loadImage(imgPath, colorSpace, prefs)
 
-                        texNode.image = bpy.data.images.load(imgPath)
-                        texNode.show_texture = True
-                        texNode.image.colorspace_settings.name = colorSpaces[0]
+                    # Assets sharing the same map set and settings share the same node graph,
+                    # so the material is copied from a template when one is available.
+                    with Megascans_Timings.span("nodes"):
+                        mat = Megascans_MaterialTemplates.instantiate(signature, self.materialName)
+                        if mat is None:
+                            mat = self.buildMaterial(maps_, prefs, specularColor is not None, packs)
+                            Megascans_MaterialTemplates.store(signature, mat)
 
-                        mat.node_tree.links.new(mainMat.inputs['Specular'], texNode.outputs[0])
-                else:
-                    try:
-                        rgbNode = nodes.new('ShaderNodeOctRGBSpectrumTex')
-                        targetJson = self.assetJson["maps"] if ("maps" in self.assetJson) else self.assetJson["components"]
-                        specularItems = [item for item in targetJson if item["type"] == "specular"]
-                        if len(specularItems) > 0:
-                            hexValue = specularItems[0]['averageColor'].lstrip('#')
-                            specValue = [col/255 for col in [int(hexValue[i:i+2], 16) for i in (0, 2, 4)]]
-                            specValue.append(1)
-
-                            rgbNode.location = (-720, 200)
-                            rgbNode.inputs[0].default_value = tuple(specValue)
-
-                            mat.node_tree.links.new(mainMat.inputs['Specular'], rgbNode.outputs[0])
-                    except Exception as e:
-                        print( "Cannot find specular information : ", str(e) )
+                        self.applyAssetValues(mat, images, specularColor)
+
+                # iterate through all objects, the instance empties are added afterwards
+                for obj in self.selectedObjects:
+                    # assign material to obj
+                    obj.active_material = mat
+
+                if source is not None:
+                    self.createInstance(source)
 
-                # Create the bump map setup
-                if ("bump" in maps_) and (prefs.is_cavity_enabled):
-                    texNode = nodes.new('ShaderNodeOctImageTex')
+                self.objectStates = objectStates
+                journalArgs = (scene.name, geometryState, mat.name, signature, slots, source.name if source is not None else None)
+                if upgradeLods is None and not upgradeImages:
+                    self.recordJournal(*journalArgs)
+                    return
 
-                    imgPath = [item[2] for item in self.textureList if item[1] == "bump"]
-                    if len(imgPath) >= 1:
-                        imgPath = imgPath[0].replace("\\", "/")
+                # The journal is recorded once the asset is complete.
+                if upgradeLods is not None:
+                    collection = bpy.context.view_layer.active_layer_collection.collection
+                    Megascans_Upgrades.add(self.upgradeGeometry, upgradeLods, collection.name, mat.name,
+                                           [obj.name for obj, hidden in objectStates])
+                for nodeName, imgPath, colorSpace in upgradeImages:
+                    Megascans_Upgrades.add(self.upgradeImage, mat.name, nodeName, imgPath, colorSpace)
+                Megascans_Upgrades.add(self.recordJournal, *journalArgs)
 
-                        y_exp += -320
-                        texNode.location = (-720, y_exp)
+        except Exception as e:
+            print( "Megascans LiveLink Error while importing textures/geometry or setting up material. Error: ", str(e) )
+
+    def recordJournal(self, sceneName, geometryState, materialName, signature, slots, sourceName):
+        scene = bpy.data.scenes[sceneName]
+        mat = bpy.data.materials[materialName]
+        Megascans_ImportJournal.record(scene, self.assetID, {
+            "geometry": geometryState,
+            "objects": [[obj.name, obj.data.name if obj.data else None, hidden] for obj, hidden in self.objectStates],
+            "material": mat.name,
+            "signature": json.loads(json.dumps(signature)),
+            "images": [self.journalImage(imgPath, mat.node_tree.nodes[nodeName].image)
+                       for nodeName, imgPath, colorSpace in slots],
+            "source": sourceName
+        })
+
+    # Returns a small image to show until the map is loaded: a proxy already built for it,
+    # or for the albedo the preview image Bridge ships with the asset. Building a proxy
+    # would decode the full map first, so the other maps stay empty until then.
+    def previewImage(self, nodeName, imgPath, colorSpace):
+        try:
+            previewPath = Megascans_ProxyTextures.proxyPath(imgPath, self.previewSize)
+            if not os.path.isfile(previewPath) or os.path.getmtime(previewPath) < os.path.getmtime(imgPath):
+                previewPath = self.bridgePreview() if nodeName == self.imageNodeName("albedo") else None
+                if previewPath is None:
+                    return None
+            image = Megascans_ImageCache.load(previewPath)
+            Megascans_ImageCache.setColorSpace(image, colorSpace)
+            Megascans_TextureBudget.touch(image)
+            return image
+        except Exception as e:
+            print( "Megascans LiveLink Error loading preview texture. Error: ", str(e) )
+            return None
+
+    def bridgePreview(self):
+        try:
+            names = sorted(name for name in os.listdir(self.assetPath) if self.bridgePreviewPattern.search(name))
+        except OSError:
+            return None
+        return os.path.join(self.assetPath, names[0]).replace("\\", "/") if names else None
+
+    # Progressive import steps, run by the LiveLink timer. Datablocks are looked up by
+    # name as the user may have deleted or renamed them in the meantime.
+    # The preview objects are kept with whatever the user did to them, they get the mesh
+    # of the first LOD and the other LODs are added as hidden variants placed like them.
+    # Nothing is added for the preview objects the user deleted.
+    def upgradeGeometry(self, lods, collectionName, materialName, previewNames):
+        collection = bpy.data.collections.get(collectionName) or bpy.context.scene.collection
+        mat = bpy.data.materials.get(materialName)
+        previews = [bpy.data.objects.get(name) for name in previewNames]
+        objectStates = []
+        for index, (meshFormat, meshPath, lod) in enumerate(lods):
+            newObjects = self.importGeometry(meshFormat, meshPath, collection)
+            for position, obj in enumerate(newObjects):
+                preview = previews[position] if position < len(previews) else None
+                if preview is None and position < len(previews):
+                    mesh = obj.data
+                    bpy.data.objects.remove(obj)
+                    if mesh is not None and mesh.users == 0:
+                        bpy.data.meshes.remove(mesh)
+                    continue
+                if index == 0 and preview is not None:
+                    mesh = preview.data
+                    name = obj.name
+                    preview.data = obj.data
+                    preview.active_material = mat
+                    bpy.data.objects.remove(obj)
+                    preview.name = name
+                    if mesh is not None and mesh.users == 0:
+                        bpy.data.meshes.remove(mesh)
+                    objectStates.append( (preview, False) )
+                    continue
+                if preview is not None:
+                    obj.parent = preview.parent
+                    obj.matrix_world = preview.matrix_world.copy()
+                if index > 0:
+                    obj.hide_set(True)
+                    obj.hide_render = True
+                obj.active_material = mat
+                objectStates.append( (obj, index > 0) )
+        self.objectStates = objectStates
+
+    def upgradeImage(self, materialName, nodeName, imgPath, colorSpace):
+        mat = bpy.data.materials.get(materialName)
+        if mat is not None:
+            prefs = bpy.context.preferences.addons[__name__].preferences
+            mat.node_tree.nodes[nodeName].image = self.loadImage(imgPath, colorSpace, prefs)
+
+    # Returns the source collection of a previous instanced import of this asset, when
+    # its geometry files did not change since.
+    def instanceSource(self, entry, geometryState):
+        if entry is None or not entry.get("source") or entry["geometry"] != geometryState:
+            return None
+        return bpy.data.collections.get(entry["source"])
+
+    # Makes the given collection the import target, the active collection is used otherwise.
+    @contextlib.contextmanager
+    def importInto(self, collection):
+        view_layer = bpy.context.view_layer
+        previousLayer = view_layer.active_layer_collection
+        if collection is not None:
+            view_layer.active_layer_collection = view_layer.layer_collection.children[collection.name]
+        try:
+            yield
+        finally:
+            view_layer.active_layer_collection = previousLayer
+            # The source objects are only rendered through their instances.
+            if collection is not None:
+                view_layer.layer_collection.children[collection.name].exclude = True
+
+    # Adds an empty instancing the source collection of the asset to the active collection.
+    def createInstance(self, source):
+        instance = bpy.data.objects.new(self.assetName, None)
+        instance.instance_type = 'COLLECTION'
+        instance.instance_collection = source
+        bpy.context.view_layer.active_layer_collection.collection.objects.link(instance)
+        self.selectedObjects.append(instance)
+        return instance
+
+    # Creates new objects sharing the mesh data of a previous import of this asset.
+    # Returns a list of (object, hidden) or None when the previous data is gone.
+    def duplicateObjects(self, objects):
+        sources = []
+        for objectName, meshName, hidden in objects:
+            source = bpy.data.objects.get(objectName)
+            if source is None or source.data is None or source.data.name != meshName:
+                mesh = bpy.data.meshes.get(meshName) if meshName else None
+                if mesh is None:
+                    return None
+                source = None
+            sources.append( (source, objectName, meshName, hidden) )
+
+        collection = bpy.context.view_layer.active_layer_collection.collection
+        objectStates = []
+        for source, objectName, meshName, hidden in sources:
+            obj = source.copy() if source is not None else bpy.data.objects.new(objectName, bpy.data.meshes[meshName])
+            collection.objects.link(obj)
+            if hidden:
+                obj.hide_set(True)
+                obj.hide_render = True
+            objectStates.append( (obj, hidden) )
+        return objectStates
+
+    # Returns the material of a previous import of this asset if it can be used as is.
+    # Images whose file changed since are reloaded in place through the image cache.
+    def reuseMaterial(self, entry, slots, signature, prefs):
+        mat = bpy.data.materials.get(entry["material"])
+        if mat is None or entry["signature"] != json.loads(json.dumps(signature)):
+            return None
+        if [item[0] for item in entry["images"]] != [item[1] for item in slots]:
+            return None
+
+        for imgPath, imageName, loadedPath, mtime, size in entry["images"]:
+            image = bpy.data.images.get(imageName)
+            if image is None:
+                return None
+            Megascans_ImageCache.adopt(loadedPath, image, (mtime, size))
+
+        nodes = mat.node_tree.nodes
+        for nodeName, imgPath, colorSpace in slots:
+            nodes[nodeName].image = self.loadImage(imgPath, colorSpace, prefs)
+        return mat
+
+    # Journal record of an image: source map, datablock and the file it was loaded from.
+    def journalImage(self, imgPath, image):
+        loadedPath = bpy.path.abspath(image.filepath)
+        return [imgPath, image.name, loadedPath] + Megascans_ImportJournal.fileState(loadedPath)
+
+    # Loads the image used for a map, every image of the material goes through this method.
+    def loadImage(self, imgPath, colorSpace, prefs):
+        with Megascans_Timings.span("images", os.path.basename(imgPath)):
+            if prefs.use_proxy_textures:
+                image = Megascans_ProxyTextures.load(imgPath, int(prefs.proxy_size))
+            else:
+                image = Megascans_ImageCache.load(Megascans_DecodedCache.resolve(imgPath))
+            Megascans_ImageCache.setColorSpace(image, colorSpace)
+        Megascans_TextureBudget.touch(image)
+        return image
+
+    # Returns the maps of this asset handled by the material setup, in the order of materialMaps.
+    def gatherMaps(self, prefs):
+        maps_ = []
+        for mapType, colorSpace, inputName, setup, stacked in self.materialMaps:
+            if mapType in self.maps and self.usesMap(mapType, prefs):
+                maps_.append( (mapType, colorSpace, inputName, setup, stacked, self.maps[mapType]) )
+        return maps_
+
+    # Returns True if the material setup loads maps of this type with the current preferences.
+    @classmethod
+    def usesMap(cls, mapType, prefs):
+        if mapType in cls.optionalMaps and not getattr(prefs, cls.optionalMaps[mapType]):
+            return False
+        return any(mapType == item[0] for item in cls.materialMaps)
+
+    @classmethod
+    def usedMaps(cls, prefs):
+        return frozenset(item[0] for item in cls.materialMaps if cls.usesMap(item[0], prefs))
+
+    # Returns the (mapTypes, packPath) groups of scalar maps read from one packed image.
+    # Maps whose pack cannot be built are kept as separate images.
+    def packMaps(self, maps_, prefs):
+        if not prefs.pack_scalar_maps or not Megascans_PackedTextures.isSupported():
+            return []
+        paths = {item[0]: item[5] for item in maps_}
+        packs = []
+        for group in Megascans_PackedTextures.groups(paths):
+            try:
+                with Megascans_Timings.span("pack", ", ".join(group)):
+                    packs.append( (group, Megascans_PackedTextures.pack([paths[mapType] for mapType in group])) )
+            except Exception as e:
+                print( "Megascans LiveLink Error packing scalar maps, using separate maps. Error: ", str(e) )
+        return packs
+
+    # Returns the images of the material as (nodeName, imgPath, colorSpace), one for
+    # every map that is not packed and one for every packed group.
+    def imageSlots(self, maps_, packs, prefs):
+        packed = [mapType for group, packPath in packs for mapType in group]
+        slots = []
+        for mapType, colorSpace, inputName, setup, stacked, imgPath in maps_:
+            if mapType == "displacement":
+                imgPath = self.displacementMap(imgPath, prefs)
+            if mapType not in packed:
+                slots.append( (self.imageNodeName(mapType), imgPath, colorSpace) )
+        for index, (group, packPath) in enumerate(packs):
+            slots.append( (self.packedNodeName(index), packPath.replace("\\", "/"), "Linear") )
+        return slots
+
+    # Octane resamples the displacement map to the displacement level anyway, so a copy
+    # downscaled to that size is loaded instead of the full resolution map. Vertex
+    # displacement samples the map at the vertices of the subdivided mesh.
+    def displacementMap(self, imgPath, prefs):
+        if prefs.disp_type == "TEXTURE":
+            size = int(prefs.disp_level_texture.rsplit("_", 1)[1])
+        else:
+            size = 256 << prefs.disp_level_vertex
+        try:
+            with Megascans_Timings.span("displacement", os.path.basename(imgPath)):
+                return Megascans_ProxyTextures.resample(imgPath, size, "disp").replace("\\", "/")
+        except Exception as e:
+            print( "Megascans LiveLink Error resampling displacement map. Error: ", str(e) )
+            return imgPath
 
-                        texNode.image = bpy.data.images.load(imgPath)
-                        texNode.show_texture = True
-                        texNode.image.colorspace_settings.name = colorSpaces[1]
+    # Reads the specular average color from the asset metadata, used when there is no specular map.
+    def getSpecularColor(self):
+        try:
+            if self.assetMetadata is not None and "specular" in self.assetMetadata["averageColors"]:
+                hexValue = self.assetMetadata["averageColors"]["specular"].lstrip('#')
+                specValue = [col/255 for col in [int(hexValue[i:i+2], 16) for i in (0, 2, 4)]]
+                specValue.append(1)
+                return tuple(specValue)
+        except Exception as e:
+            print( "Cannot find specular information : ", str(e) )
+        return None
+
+    def imageNodeName(self, mapType):
+        return "MS_" + mapType
+
+    def packedNodeName(self, index):
+        return "MS_packed%d" % index
+
+    # Builds the Octane node graph for the given maps. Image nodes are named after their
+    # map type so that the images and per asset values can be swapped by applyAssetValues.
+    def buildMaterial(self, maps_, prefs, hasSpecularColor, packs):
+        mat = bpy.data.materials.new( self.materialName )
+        mat.use_nodes = True
+        nodes = mat.node_tree.nodes
+
+        # replace default octane shader with a universal shader
+        outNode = nodes[0]
+        oldMainMat = nodes[1]
+        mainMat = nodes.new('ShaderNodeOctUniversalMat')
+        mainMat.name = "MS_Universal"
+        mainMat.location = oldMainMat.location
+        nodes.remove(oldMainMat)
+        mat.node_tree.links.new(outNode.inputs['Surface'], mainMat.outputs[0])
+
+        mainMat.inputs['Dielectric IOR'].default_value = 1.52 # IOR Value
+        mainMat.inputs['Specular'].default_value = 0.5
+
+        y_exp = 310
+
+        # Packed maps are read from the channel of their group image through a channel picker.
+        channels = {}
+        for index, (group, packPath) in enumerate(packs):
+            for channel, mapType in enumerate(group):
+                channels[mapType] = (index, channel)
+        packNodes = {}
+        placed = set()
+
+        for mapType, colorSpace, inputName, setup, stacked, imgPath in maps_:
+            if mapType in channels:
+                index, channel = channels[mapType]
+                texNode = nodes.new('ShaderNodeOctChannelPickerTex')
+                texNode.inputs['Channel'].default_value = Megascans_PackedTextures.channels[channel]
+                if index not in packNodes:
+                    packNodes[index] = nodes.new('ShaderNodeOctImageTex')
+                    packNodes[index].name = self.packedNodeName(index)
+                    packNodes[index].show_texture = True
+                mat.node_tree.links.new(texNode.inputs['Texture'], packNodes[index].outputs[0])
+            else:
+                texNode = nodes.new('ShaderNodeOctImageTex')
+                texNode.name = self.imageNodeName(mapType)
+                texNode.show_texture = True
+            if stacked:
+                y_exp += -320
+                texNode.location = (-720, y_exp)
+                if mapType in channels and channels[mapType][0] not in placed:
+                    placed.add(channels[mapType][0])
+                    packNodes[channels[mapType][0]].location = (-1080, y_exp)
+
+            if inputName is not None:
+                mat.node_tree.links.new(mainMat.inputs[inputName], texNode.outputs[0])
+            if setup is not None:
+                getattr(self, setup)(mat, mainMat, outNode, texNode, prefs)
+
+        # Without a specular map the specular color comes from the asset json.
+        if "specular" not in [item[0] for item in maps_]:
+            rgbNode = nodes.new('ShaderNodeOctRGBSpectrumTex')
+            rgbNode.name = "MS_SpecularColor"
+            if hasSpecularColor:
+                rgbNode.location = (-720, 200)
+                mat.node_tree.links.new(mainMat.inputs['Specular'], rgbNode.outputs[0])
+
+        return mat
+
+    # Create the fuzziness setup.
+    def setupFuzz(self, mat, mainMat, outNode, texNode, prefs):
+        mainMat.inputs['Sheen Roughness'].default_value = 0
+
+    # Create the displacement setup.
+    def setupDisplacement(self, mat, mainMat, outNode, texNode, prefs):
+        nodes = mat.node_tree.nodes
+        if prefs.disp_type == "VERTEX":
+            texNode.border_mode = 'OCT_BORDER_MODE_CLAMP'
+
+        if prefs.disp_type == "TEXTURE":
+            dispNode = nodes.new('ShaderNodeOctDisplacementTex')
+            dispNode.displacement_level = prefs.disp_level_texture
+            #dispNode.displacement_filter = 'OCTANE_FILTER_TYPE_BOX'
+            dispNode.inputs['Mid level'].default_value = 0.5
+            dispNode.inputs['Height'].default_value = 0.1
+        else:
+            dispNode = nodes.new('ShaderNodeOctVertexDisplacementTex')
+            dispNode.inputs['Auto bump map'].default_value = True
+            dispNode.inputs['Mid level'].default_value = 0.1
+            dispNode.inputs['Height'].default_value = 0.1
+            dispNode.inputs['Subdivision level'].default_value = prefs.disp_level_vertex
 
-                        #mat.node_tree.links.new(mainMat.inputs['Bump'], texNode.outputs[0])
+        dispNode.location = (-360, -680)
 
-                if ("cavity" in maps_) and (prefs.is_cavity_enabled):
-                    texNode = nodes.new('ShaderNodeOctImageTex')
+        mat.node_tree.links.new(dispNode.inputs['Texture'], texNode.outputs[0])
+        mat.node_tree.links.new(mainMat.inputs['Displacement'], dispNode.outputs[0])
 
-                    imgPath = [item[2] for item in self.textureList if item[1] == "cavity"]
-                    if len(imgPath) >= 1:
-                        imgPath = imgPath[0].replace("\\", "/")
+    # Create the translucency setup.
+    def setupTranslucency(self, mat, mainMat, outNode, texNode, prefs):
+        scatterNode = mat.node_tree.nodes.new('ShaderNodeOctScatteringMedium')
+        scatterNode.inputs['Absorption Tex'].default_value = (1, 1, 1, 1)
+        scatterNode.inputs['Invert abs.'].default_value = False
+        scatterNode.location = (-360, -1000)
 
-                        y_exp += -320
-                        texNode.location = (-720, y_exp)
+        mat.node_tree.links.new(mainMat.inputs['Medium'], scatterNode.outputs[0])
 
-                        texNode.image = bpy.data.images.load(imgPath)
-                        texNode.show_texture = True
-                        texNode.image.colorspace_settings.name = colorSpaces[1]
+    # Create the opacity setup
+    def setupOpacity(self, mat, mainMat, outNode, texNode, prefs):
+        nodes = mat.node_tree.nodes
+        texNode.location = (256, 0)
 
+        mixNode = nodes.new('ShaderNodeOctMixMat')
+        mixNode.location = (630, 0)
+        mixNode.inputs['Amount'].default_value = 1
+        mat.node_tree.links.new(mixNode.inputs['Amount'], texNode.outputs[0])
+
+        transpNode = nodes.new('ShaderNodeOctDiffuseMat')
+        transpNode.location = (256, -320)
+        transpNode.inputs['Opacity'].default_value = 0
+
+        mat.node_tree.links.new(mixNode.inputs['Material1'], mainMat.outputs[0])
+        mat.node_tree.links.new(mixNode.inputs['Material2'], transpNode.outputs[0])
+
+        mat.node_tree.links.new(outNode.inputs['Surface'], mixNode.outputs[0])
+
+        mat.blend_method = 'CLIP'
+        mat.shadow_method = 'CLIP'
+
+    # Sets the values that differ between assets sharing the same node graph.
+    def applyAssetValues(self, mat, images, specularColor):
+        nodes = mat.node_tree.nodes
+        nodes["MS_Universal"].inputs['Metallic'].default_value = 1 if self.isMetal else 0 # Metallic value
+        for nodeName, image in images.items():
+            nodes[nodeName].image = image
+        if specularColor is not None:
+            nodes["MS_SpecularColor"].inputs[0].default_value = specularColor
+
+
+# MS_ImportBatch tracks the progress of one Bridge export. The total number of
+# assets is only known once the whole payload has been received.
+class MS_ImportBatch():
+
+    batchCount = 0
+
+    def __init__(self):
+        MS_ImportBatch.batchCount += 1
+        self.batchID = MS_ImportBatch.batchCount
+        self.received = 0
+        self.imported = 0
+        self.total = None
+        self.startTime = time.time()
+        self.session = None
+
+
+# MS_BatchImport groups the assets of a large Bridge export. They are imported into a
+# dedicated collection that stays disabled in the viewport until the whole export is
+# done, so the depsgraph does not evaluate every new object as it arrives. The imports
+# run from the timer, which pushes no undo step, so the single step pushed once the
+# export is done holds the whole export.
+class MS_BatchImport():
+
+    sessions = []
+
+    def __init__(self, batch):
+        self.batch = batch
+        self.collection = bpy.data.collections.new("Megascans_Export_%d" % batch.batchID)
+        bpy.context.scene.collection.children.link(self.collection)
+        self.collection.hide_viewport = True
+        MS_BatchImport.sessions.append(self)
+
+    # Makes the batch collection the import target while an asset of the batch is imported.
+    @contextlib.contextmanager
+    def importInto(self):
+        view_layer = bpy.context.view_layer
+        previousLayer = view_layer.active_layer_collection
+        view_layer.active_layer_collection = view_layer.layer_collection.children[self.collection.name]
+        try:
+            yield
+        finally:
+            view_layer.active_layer_collection = previousLayer
+
+    def finish(self):
+        MS_BatchImport.sessions.remove(self)
+        self.collection.hide_viewport = False
+        try:
+            bpy.ops.ed.undo_push(message="Megascans LiveLink import")
         except Exception as e:
-            print( "Megascans LiveLink Error while importing textures/geometry or setting up material. Error: ", str(e) )
+            print( "Megascans LiveLink Error pushing the undo step. Error: ", str(e) )
+        bpy.context.view_layer.update()
+        print("Megascans LiveLink: batch import of export #%d done in %.1fs" % (self.batch.batchID, time.time() - self.batch.startTime))
+
+    # Finishes the sessions whose export has been fully received and imported.
+    @classmethod
+    def finishCompleted(cls):
+        for session in list(cls.sessions):
+            if session.batch.imported == session.batch.total:
+                session.finish()
+
+    # Drops the sessions of a file that was closed, the rest of their exports is imported normally.
+    @classmethod
+    def clear(cls):
+        for session in cls.sessions:
+            session.batch.session = None
+        del cls.sessions[:]
+
+
+# MS_BridgeConnection holds the state of one Bridge connection. Data is received
+# straight into a preallocated bytearray through a memoryview and handed to the
+# incremental parser, so payloads are processed in linear time and the buffer is
+# reused for every chunk.
+class MS_BridgeConnection():
+
+    byeMessage = b'Bye Megascans'
+
+    def __init__(self, size=65536):
+        self.buffer = bytearray(size)
+        self.view = memoryview(self.buffer)
+        self.parser = MS_JsonArrayParser()
+        self.batch = MS_ImportBatch()
+        self.head = b""
+        self.connectedTime = time.perf_counter()
+
+    # Returns the list of completed asset elements, or None once the client closed the connection.
+    def receiveFrom(self, client):
+        received = client.recv_into(self.view)
+        if not received:
+            return None
+        if len(self.head) < len(self.byeMessage):
+            self.head += bytes(self.view[:min(received, len(self.byeMessage) - len(self.head))])
+        return self.parser.feed(self.view[:received])
+
+    def isBye(self):
+        return not self.parser.started and self.head == self.byeMessage
 
 class ms_Init(threading.Thread):
     
 	#Initialize the thread and assign the method (i.e. importer) to be called when it receives JSON data.
-    def __init__(self, importer):
+    def __init__(self, importer, port=28888, portRange=1):
         threading.Thread.__init__(self)
+        self.daemon = True
         self.importer = importer
+        # The first free port of [firstPort, firstPort + portRange) is used, bound is set once it is known.
+        self.firstPort = port
+        self.portRange = max(1, portRange)
+        self.port = None
+        self.bound = threading.Event()
+        self.selector = selectors.DefaultSelector()
+        self.stopEvent = threading.Event()
+        # Socket pair used to wake up the selector when the server has to stop.
+        self.wakeRecv, self.wakeSend = socket.socketpair()
+
+	#Ask the listening loop to exit and close every connection.
+    def stop(self):
+        self.stopEvent.set()
+        try:
+            self.wakeSend.send(b'\0')
+        except OSError:
+            pass
 
 	#Start the thread to start listing to the port.
     def run(self):
+        socket_ = None
         try:
-            run_livelink = True
-            host, port = 'localhost', 28888
-            #Making a socket object.
-            socket_ = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            #Binding the socket to host and port number mentioned at the start.
-            socket_.bind((host, port))
-
-            #Run until the thread starts receiving data.
-            while run_livelink:
-                socket_.listen(5)
-                #Accept connection request.
-                client, addr = socket_.accept()
-                data = ""
-                buffer_size = 4096*2
-                #Receive data from the client. 
-                data = client.recv(buffer_size)
-                if data == b'Bye Megascans':
-                    run_livelink = False
+            host = 'localhost'
+            #Binding the socket to the first free port, other Blender instances may use the previous ones.
+            for port in range(self.firstPort, self.firstPort + self.portRange):
+                #Making a socket object.
+                socket_ = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                #Rebind right away after a restart, Windows allows it already and would let two listeners share the port.
+                if os.name != 'nt':
+                    socket_.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                try:
+                    socket_.bind((host, port))
                     break
-
-                #If any data is received over the port.
-                if data != "":
-                    self.TotalData = b""
-                    self.TotalData += data #Append the previously received data to the Total Data.
-                    #Keep running until the connection is open and we are receiving data.
-                    while run_livelink:
-                        #Keep receiving data from client.
-                        data = client.recv(4096*2)
-                        if data == b'Bye Megascans':
-                            run_livelink = False
-                            break
-                        #if we are getting data keep appending it to the Total data.
-                        if data : self.TotalData += data
-                        else:
-                            #Once the data transmission is over call the importer method and send the collected TotalData.
-                            self.importer(self.TotalData)
-                            break
+                except OSError:
+                    socket_.close()
+                    socket_ = None
+            if socket_ is None:
+                raise OSError("no free port between %d and %d" % (self.firstPort, self.firstPort + self.portRange - 1))
+            self.port = port
+            socket_.listen(5)
+            socket_.setblocking(False)
+
+            self.selector.register(socket_, selectors.EVENT_READ)
+            self.selector.register(self.wakeRecv, selectors.EVENT_READ)
+            self.bound.set()
+
+            #Serve every connection until we are asked to stop.
+            while not self.stopEvent.is_set():
+                for key, mask in self.selector.select():
+                    if key.fileobj is socket_:
+                        self.accept(socket_)
+                    elif key.fileobj is self.wakeRecv:
+                        self.wakeRecv.recv(64)
+                    else:
+                        self.receive(key.fileobj, key.data)
         except Exception as e:
             print( "Megascans LiveLink Error initializing the thread. Error: ", str(e) )
+        finally:
+            self.bound.set()
+            self.close(socket_)
+
+    def accept(self, socket_):
+        try:
+            client, addr = socket_.accept()
+        except BlockingIOError:
+            return
+        client.setblocking(False)
+        self.selector.register(client, selectors.EVENT_READ, MS_BridgeConnection())
+
+    def receive(self, client, connection):
+        try:
+            elements = connection.receiveFrom(client)
+            if elements is None:
+                connection.parser.close()
+        except (BlockingIOError, InterruptedError):
+            return
+        except (OSError, ValueError) as e:
+            print( "Megascans LiveLink Error receiving data. Error: ", str(e) )
+            elements = None
+
+        if elements:
+            #Call the importer method for every asset as soon as it is complete.
+            for asset, parseTime in zip(elements, connection.parser.parseTimes):
+                try:
+                    record = MS_AssetRecord(asset)
+                except ValueError as e:
+                    print( "Megascans LiveLink rejected an asset of the payload. Error: ", str(e) )
+                    continue
+                connection.batch.received += 1
+                stamps = {"connected": connection.connectedTime, "received": time.perf_counter(), "parse": parseTime}
+                self.importer(record, connection.batch, stamps)
+            return
+        if elements is not None:
+            return
+
+        #Once the client closed the connection the payload is complete.
+        self.selector.unregister(client)
+        client.close()
+        connection.batch.total = connection.batch.received
+        if connection.isBye():
+            self.stopEvent.set()
+
+    def close(self, socket_):
+        for key in list(self.selector.get_map().values()):
+            self.selector.unregister(key.fileobj)
+            if key.fileobj is not self.wakeRecv:
+                key.fileobj.close()
+        self.selector.close()
+        if socket_ is not None:
+            socket_.close()
+        self.wakeRecv.close()
+        self.wakeSend.close()
+
+# MS_InstanceRegistry advertises this Blender instance to the local dispatcher
+# (dispatcher.py), with one small JSON file per instance in the temp folder holding
+# the port it listens on and the number of assets waiting to be imported.
+class MS_InstanceRegistry():
+
+    directory = os.path.join(tempfile.gettempdir(), "MSLiveLink")
 
-class thread_checker(threading.Thread):
-    
-	#Initialize the thread and assign the method (i.e. importer) to be called when it receives JSON data.
     def __init__(self):
-        threading.Thread.__init__(self)
+        self.path = os.path.join(self.directory, "instance_%d.json" % os.getpid())
+        self.published = None
 
-	#Start the thread to start listing to the port.
-    def run(self):
+    def publish(self, port, pending):
+        if self.published == (port, pending):
+            return
         try:
-            run_checker = True
-            while run_checker:
-                time.sleep(3)
-                for i in threading.enumerate():
-                    if(i.getName() == "MainThread" and i.is_alive() == False):
-                        host, port = 'localhost', 28888
-                        s = socket.socket()
-                        s.connect((host,port))
-                        data = "Bye Megascans"
-                        s.send(data.encode())
-                        s.close()
-                        run_checker = False
-                        break
-        except Exception as e:
-            print( "Megascans LiveLink Error initializing thread checker. Error: ", str(e) )
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.path + ".tmp", 'w') as fl_:
+                json.dump({"pid": os.getpid(), "port": port, "pending": pending, "updated": time.time()}, fl_)
+            os.replace(self.path + ".tmp", self.path)
+            self.published = (port, pending)
+        except OSError as e:
+            print( "Megascans LiveLink Error registering the instance. Error: ", str(e) )
+
+    def remove(self):
+        self.published = None
+        try:
+            os.remove(self.path)
+        except OSError:
             pass
 
-class MS_Init_LiveLink(bpy.types.Operator):
+Megascans_Registry = MS_InstanceRegistry()
 
-    bl_idname = "ms_livelink.py"
-    bl_label = "Megascans LiveLink Octane"
-    socketCount = 0
 
-    def execute(self, context):
+# MS_LiveLinkServer manages the lifecycle of the LiveLink: the listening thread and
+# the import timer. It is started when the addon is registered, restarted from the
+# import menu and stopped when the addon is unregistered or Blender exits. The
+# listener is joined on stop so the port is free again right away, e.g. when the
+# addon is reinstalled, and it sleeps in select() until something happens.
+class MS_LiveLinkServer():
 
-        try:
-            globals()['Megascans_DataSet'] = None
-            self.thread_ = threading.Thread(target = self.socketMonitor)
-            self.thread_.start()
-            bpy.app.timers.register(self.newDataMonitor)
-            return {'FINISHED'}
-        except Exception as e:
-            print( "Megascans LiveLink error starting blender plugin. Error: ", str(e) )
-            return {"FAILED"}
+    # The import timer polls quickly while assets are pending and backs off
+    # up to maxPollInterval when idle. Each tick imports at most maxAssetsPerTick.
+    minPollInterval = 0.02
+    maxPollInterval = 0.5
+    maxAssetsPerTick = 1
+    joinTimeout = 2.0
+    # Seconds an export below the batch threshold waits for more assets before it is imported normally.
+    batchWait = 5.0
+
+    def __init__(self):
+        self.server = None
+        self.pollInterval = self.minPollInterval
+        # Map types prefetched by the listener thread, read from the preferences on the main thread.
+        self.prefetchMaps = frozenset(item[0] for item in MS_Init_ImportProcess.materialMaps)
+        # Timers are matched by identity, so the bound method is created once.
+        self.timer = self.newDataMonitor
+
+    def isRunning(self):
+        return self.server is not None and self.server.is_alive()
+
+    def start(self):
+        if not self.isRunning():
+            prefs = bpy.context.preferences.addons[__name__].preferences
+            self.prefetchMaps = MS_Init_ImportProcess.usedMaps(prefs)
+            self.server = ms_Init(self.importer, prefs.port, prefs.port_range)
+            self.server.start()
+            if self.server.bound.wait(self.joinTimeout) and self.server.port is not None:
+                print("Megascans LiveLink listening on port %d" % self.server.port)
+                Megascans_Registry.publish(self.server.port, Megascans_ImportQueue.qsize())
+        self.registerTimer()
+
+    def stop(self):
+        if bpy.app.timers.is_registered(self.timer):
+            bpy.app.timers.unregister(self.timer)
+        if self.server is not None:
+            self.server.stop()
+            self.server.join(self.joinTimeout)
+            self.server = None
+        Megascans_Registry.remove()
+
+    def restart(self):
+        self.stop()
+        self.start()
+
+    # The timer is persistent, it is registered again after a file load in case it was dropped.
+    def registerTimer(self):
+        if not bpy.app.timers.is_registered(self.timer):
+            self.pollInterval = self.minPollInterval
+            bpy.app.timers.register(self.timer, persistent=True)
 
     def newDataMonitor(self):
+        processed = 0
         try:
-            if globals()['Megascans_DataSet'] != None:
-                MS_Init_ImportProcess()
-                globals()['Megascans_DataSet'] = None       
+            self.prefetchMaps = MS_Init_ImportProcess.usedMaps(bpy.context.preferences.addons[__name__].preferences)
+            while processed < self.maxAssetsPerTick and self.readyToImport():
+                try:
+                    record, batch, stamps = Megascans_ImportQueue.get_nowait()
+                except queue.Empty:
+                    break
+                processed += 1
+
+                # Large exports are imported in batch mode from their first asset.
+                threshold = bpy.context.preferences.addons[__name__].preferences.batch_threshold
+                if batch.session is None and batch.imported == 0 and threshold > 0 and batch.received >= threshold:
+                    batch.session = MS_BatchImport(batch)
+
+                if batch.session is not None:
+                    with batch.session.importInto():
+                        MS_Init_ImportProcess(record, stamps)
+                else:
+                    MS_Init_ImportProcess(record, stamps)
+                batch.imported += 1
+                self.reportProgress(batch)
         except Exception as e:
             print( "Megascans LiveLink error starting blender plugin (newDataMonitor). Error: ", str(e) )
-            return {"FAILED"}
-        return 1.0
 
+        try:
+            MS_BatchImport.finishCompleted()
+        except Exception as e:
+            print( "Megascans LiveLink error finishing batch import. Error: ", str(e) )
 
-    def socketMonitor(self):
+        # Progressive imports are completed once the new assets are all shown.
+        if not processed and Megascans_Upgrades.pending():
+            Megascans_Upgrades.runNext()
+            processed += 1
+
+        if processed or not Megascans_ImportQueue.empty() or Megascans_Upgrades.pending():
+            self.pollInterval = self.minPollInterval
+        else:
+            # Persist the metadata cache and release texture memory once the imports are done.
+            Megascans_MetadataCache.save()
+            try:
+                Megascans_TextureBudget.enforce(bpy.context.preferences.addons[__name__].preferences.texture_budget)
+            except Exception as e:
+                print( "Megascans LiveLink error releasing texture memory. Error: ", str(e) )
+            self.pollInterval = min(self.pollInterval * 2, self.maxPollInterval)
+
+        # Let the dispatcher know how busy this instance is.
+        if self.server is not None and self.server.port is not None:
+            Megascans_Registry.publish(self.server.port, Megascans_ImportQueue.qsize())
+        return self.pollInterval
+
+    # The first asset of an export waits until enough assets have been received to know
+    # whether the export is a batch import, or until the whole export has been received.
+    def readyToImport(self):
+        with Megascans_ImportQueue.mutex:
+            if not Megascans_ImportQueue.queue:
+                return True
+            batch = Megascans_ImportQueue.queue[0][1]
+        threshold = bpy.context.preferences.addons[__name__].preferences.batch_threshold
+        if batch.imported or batch.session is not None or threshold <= 0:
+            return True
+        return batch.received >= threshold or batch.total is not None or time.time() - batch.startTime > self.batchWait
+
+    def reportProgress(self, batch):
+        total = str(batch.total) if batch.total is not None else "?"
+        message = "Megascans LiveLink: imported asset %d/%s of export #%d (%.1fs)" % (
+            batch.imported, total, batch.batchID, time.time() - batch.startTime)
+        print(message)
+        # status_text_set uses the window of the context, which timers do not have. Each window
+        # is made the context where Blender supports it (3.2 and later), older versions only print.
+        if not hasattr(bpy.context, "temp_override"):
+            return
+        text = None if batch.imported == batch.total else message
         try:
-            #Making a thread object
-            threadedServer = ms_Init(self.importer)
-            #Start the newly created thread.
-            threadedServer.start()
-            #Making a thread object
-            thread_checker_ = thread_checker()
-            #Start the newly created thread.
-            thread_checker_.start()
+            for window in bpy.context.window_manager.windows:
+                with bpy.context.temp_override(window=window, workspace=window.workspace):
+                    window.workspace.status_text_set(text)
         except Exception as e:
-            print( "Megascans LiveLink error starting blender plugin (socketMonitor). Error: ", str(e) )
-            return {"FAILED"}
+            print( "Megascans LiveLink Error reporting the import progress. Error: ", str(e) )
 
-    def importer (self, recv_data):
+    def importer (self, record, batch, stamps=None):
         try:
-            globals()['Megascans_DataSet'] = recv_data
+            # Assets are parsed on the socket thread so the main thread only does the import.
+            # Their texture files start loading in the background right away, only the
+            # maps the material setup uses are read. bpy is not touched on this thread.
+            prefetchMaps = self.prefetchMaps
+            Megascans_Prefetcher.prefetch([path for mapType, path in record.maps.items() if mapType in prefetchMaps])
+            Megascans_Prefetcher.submit(Megascans_MetadataCache.get, record.assetPath, record.assetID)
+            Megascans_ImportQueue.put((record, batch, stamps))
         except Exception as e:
             print( "Megascans LiveLink error starting blender plugin (importer). Error: ", str(e) )
+
+Megascans_LiveLink = MS_LiveLinkServer()
+
+@persistent
+def serverLoadPostHandler(dummy):
+    MS_BatchImport.clear()
+    if Megascans_LiveLink.isRunning():
+        Megascans_LiveLink.registerTimer()
+
+
+class MS_Init_LiveLink(bpy.types.Operator):
+
+    bl_idname = "ms_livelink.py"
+    bl_label = "Megascans LiveLink Octane"
+
+    # (Re)starts the LiveLink, e.g. after it was stopped by a "Bye Megascans" message.
+    def execute(self, context):
+        try:
+            Megascans_LiveLink.restart()
+            return {'FINISHED'}
+        except Exception as e:
+            print( "Megascans LiveLink error starting blender plugin. Error: ", str(e) )
             return {"FAILED"}
         
 
+class MS_BuildMetadataIndex(bpy.types.Operator):
+
+    bl_idname = "ms_livelink.build_metadata_index"
+    bl_label = "Build Megascans Metadata Index"
+    bl_description = "Index the asset metadata of a Megascans library folder"
+
+    directory: StringProperty(subtype='DIR_PATH')
+
+    def invoke(self, context, event):
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+
+    def execute(self, context):
+        # Indexing only reads files, so it runs in the background.
+        thread_ = threading.Thread(target = self.indexLibrary, args = (self.directory,))
+        thread_.daemon = True
+        thread_.start()
+        return {'FINISHED'}
+
+    def indexLibrary(self, directory):
+        start = time.time()
+        count = Megascans_MetadataCache.indexLibrary(directory)
+        print("Megascans LiveLink indexed %d assets from %s in %.1fs" % (count, directory, time.time() - start))
+
+class MS_PT_ImportTimings(bpy.types.Panel):
+
+    bl_idname = "MS_PT_import_timings"
+    bl_label = "Megascans Import Timings"
+    bl_space_type = 'VIEW_3D'
+    bl_region_type = 'UI'
+    bl_category = "Megascans"
+
+    @classmethod
+    def poll(cls, context):
+        return context.preferences.addons[__name__].preferences.enable_timings
+
+    def draw(self, context):
+        layout = self.layout
+        if not Megascans_Timings.records:
+            layout.label(text="No import recorded yet")
+            return
+        for record in reversed(Megascans_Timings.records):
+            box = layout.box()
+            totals = Megascans_Timings.summarize(record)
+            box.label(text="%s  %.0f ms" % (record["asset"], totals.get("total", 0)), icon='TIME')
+            col = box.column(align=True)
+            for stage, milliseconds in totals.items():
+                if stage != "total":
+                    col.label(text="%s: %.1f ms" % (stage, milliseconds))
+
+class MS_PT_TextureMemory(bpy.types.Panel):
+
+    bl_idname = "MS_PT_texture_memory"
+    bl_label = "Megascans Texture Memory"
+    bl_space_type = 'VIEW_3D'
+    bl_region_type = 'UI'
+    bl_category = "Megascans"
+
+    def draw(self, context):
+        layout = self.layout
+        budget = context.preferences.addons[__name__].preferences.texture_budget
+        count, used = Megascans_TextureBudget.usage()
+        col = layout.column(align=True)
+        col.label(text="%d images, %.0f MB loaded" % (count, used / (1024 * 1024)), icon='TEXTURE')
+        col.label(text="Budget: %s" % ("%d MB" % budget if budget > 0 else "unlimited"))
+        col.label(text="Removed: %d  Freed: %d" % (Megascans_TextureBudget.removed, Megascans_TextureBudget.freed))
+
 def show_error_dialog(self, context):
      self.report({'INFO'}, "This is a test")
 
@@ -591,13 +2317,47 @@ def menu_func_import(self, context):
 
 
 def register():
+    bpy.app.handlers.load_post.append(clearJournalHandler)
+    bpy.app.handlers.load_post.append(serverLoadPostHandler)
+    bpy.app.handlers.render_pre.append(proxyRenderPreHandler)
+    bpy.app.handlers.render_complete.append(proxyRenderPostHandler)
+    bpy.app.handlers.render_cancel.append(proxyRenderPostHandler)
     bpy.utils.register_class(MS_Init_LiveLink)
+    bpy.utils.register_class(MS_BuildMetadataIndex)
     bpy.utils.register_class(MSLiveLinkPrefs)
+    bpy.utils.register_class(MS_PT_ImportTimings)
+    bpy.utils.register_class(MS_PT_TextureMemory)
     bpy.types.TOPBAR_MT_file_import.append(menu_func_import)
+    Megascans_DecodedCache.configure(bpy.context.preferences.addons[__name__].preferences)
+    Megascans_ProxyTextures.fullResolution = bpy.context.preferences.addons[__name__].preferences.proxy_full_resolution
+    # Background instances (render farms, the library builder) do not listen to Bridge.
+    if not bpy.app.background:
+        Megascans_LiveLink.start()
+    atexit.register(Megascans_LiveLink.stop)
 
 def unregister():
+    atexit.unregister(Megascans_LiveLink.stop)
+    Megascans_LiveLink.stop()
+    # Show the collections of exports that were still being imported.
+    for session in list(MS_BatchImport.sessions):
+        try:
+            session.finish()
+        except Exception as e:
+            print( "Megascans LiveLink error finishing batch import. Error: ", str(e) )
+    Megascans_Prefetcher.shutdown()
+    Megascans_MetadataCache.save()
+    for handlers, handler in ((bpy.app.handlers.load_post, clearJournalHandler),
+                              (bpy.app.handlers.load_post, serverLoadPostHandler),
+                              (bpy.app.handlers.render_pre, proxyRenderPreHandler),
+                              (bpy.app.handlers.render_complete, proxyRenderPostHandler),
+                              (bpy.app.handlers.render_cancel, proxyRenderPostHandler)):
+        if handler in handlers:
+            handlers.remove(handler)
     bpy.types.TOPBAR_MT_file_import.remove(menu_func_import)
+    bpy.utils.unregister_class(MS_PT_TextureMemory)
+    bpy.utils.unregister_class(MS_PT_ImportTimings)
     bpy.utils.unregister_class(MSLiveLinkPrefs)
+    bpy.utils.unregister_class(MS_BuildMetadataIndex)
     bpy.utils.unregister_class(MS_Init_LiveLink)
 
 
@@ -0,0 +1,87 @@
+# [Quixel Megascans Livelink for Octane Blender Edition]
+#
+# Parsing of the Bridge stream, shared by the LiveLink and the dispatcher. It does
+# not import bpy so the dispatcher can run it with any Python 3 interpreter.
+
+import codecs, json, re, time
+
+
+# MS_JsonArrayParser incrementally parses the JSON array sent by Bridge.
+# Bytes are fed as they arrive on the socket and every asset element is returned
+# as soon as its closing bracket has been received, without waiting for the rest
+# of the payload. Only the bracket, quote and backslash characters are scanned in
+# Python, the element itself is decoded by the json module. The dispatcher forwards
+# the elements as they are and asks for their text instead (decode=False).
+class MS_JsonArrayParser():
+
+    tokens = re.compile(r'[\[\]{}"\\]')
+
+    def __init__(self, decode=True):
+        self.decode = decode
+        self.textDecoder = codecs.getincrementaldecoder('utf-8')()
+        self.text = ""
+        self.scanPos = 0
+        self.elementStart = None
+        self.depth = 0
+        self.inString = False
+        self.started = False
+        self.finished = False
+        self.parseTimes = []
+
+    # Returns the completed elements, their json decoding times are left in parseTimes.
+    def feed(self, data):
+        self.text += self.textDecoder.decode(data)
+        elements = []
+        self.parseTimes = []
+        skipTo = self.scanPos
+        for match in self.tokens.finditer(self.text, self.scanPos):
+            pos = match.start()
+            if pos < skipTo or self.finished:
+                continue
+            token = match.group()
+
+            if self.inString:
+                if token == '"':
+                    self.inString = False
+                elif token == '\\':
+                    # Skip the escaped character, it may not have been received yet.
+                    skipTo = pos + 2
+                continue
+
+            if token == '"':
+                if self.depth == 1:
+                    raise ValueError("Bridge payload elements must be JSON objects")
+                self.inString = True
+            elif token in '[{':
+                if self.depth == 0:
+                    if token != '[':
+                        raise ValueError("Bridge payload must be a JSON array")
+                    self.started = True
+                elif self.depth == 1:
+                    self.elementStart = pos
+                self.depth += 1
+            elif token in ']}':
+                self.depth -= 1
+                if self.depth == 1:
+                    start = time.perf_counter()
+                    element = self.text[self.elementStart:pos + 1]
+                    elements.append(json.loads(element) if self.decode else element)
+                    self.parseTimes.append(time.perf_counter() - start)
+                    self.elementStart = None
+                elif self.depth == 0:
+                    self.finished = True
+                elif self.depth < 0:
+                    raise ValueError("Unbalanced brackets in Bridge payload")
+
+        # Drop the text that has been fully consumed to keep the buffer small.
+        end = max(skipTo, len(self.text))
+        keep = self.elementStart if self.elementStart is not None else len(self.text)
+        self.text = self.text[keep:]
+        self.scanPos = end - keep
+        if self.elementStart is not None:
+            self.elementStart = 0
+        return elements
+
+    def close(self):
+        if self.started and not self.finished:
+            raise ValueError("Incomplete Bridge payload")
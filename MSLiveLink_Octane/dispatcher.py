@@ -0,0 +1,171 @@
+# [Quixel Megascans Livelink for Octane Blender Edition]
+#
+# Local dispatcher for several Blender instances running the LiveLink on one machine.
+# It listens on the Bridge port (28888) and splits every export between the Blender
+# instances registered in the temp folder, each one listening on its own port set in
+# the addon preferences (e.g. 28889 with fallback ports). Every asset is forwarded as
+# soon as it has been received, either to the least loaded instance, from the number
+# of assets each one has waiting, or in turn to every instance.
+#
+#   python dispatcher.py [--port 28888] [--policy least-loaded|round-robin]
+#
+# It only uses the standard library and bridge_stream.py of the addon folder, so it
+# runs with any Python 3 interpreter.
+
+import argparse, json, os, socket, sys, tempfile, threading
+
+# Run as a script, the modules of the addon folder are importable as siblings.
+from bridge_stream import MS_JsonArrayParser
+
+registryDir = os.path.join(tempfile.gettempdir(), "MSLiveLink")
+
+
+# Returns the registered instances as dicts with their pid, port and pending assets.
+def readInstances(excludePort):
+    instances = []
+    if not os.path.isdir(registryDir):
+        return instances
+    for name in os.listdir(registryDir):
+        if not (name.startswith("instance_") and name.endswith(".json")):
+            continue
+        path = os.path.join(registryDir, name)
+        try:
+            with open(path, 'r') as fl_:
+                instance = json.load(fl_)
+        except (OSError, ValueError):
+            continue
+        if instance.get("port") == excludePort or not isAlive(instance.get("pid")):
+            continue
+        instance["file"] = path
+        instances.append(instance)
+    instances.sort(key=lambda instance: instance["port"])
+    return instances
+
+# Instances killed without unregistering are dropped, Windows relies on the connection failing instead.
+def isAlive(pid):
+    if os.name == 'nt' or not isinstance(pid, int):
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+# Export forwards the assets of one Bridge export. Each instance that gets assets of
+# the export receives them in a single connection holding a JSON array, which is
+# closed with the export so the LiveLink knows its total.
+class Export():
+
+    def __init__(self, dispatcher):
+        self.dispatcher = dispatcher
+        self.connections = {}
+        self.assigned = {}
+        self.failed = set()
+
+    def forward(self, element):
+        while True:
+            instances = [instance for instance in readInstances(self.dispatcher.port) if instance["port"] not in self.failed]
+            if not instances:
+                print("Megascans dispatcher: no Blender instance available, asset dropped")
+                return
+            instance = self.dispatcher.choose(instances, self.assigned)
+            port = instance["port"]
+            try:
+                if port in self.connections:
+                    self.connections[port].sendall(b"," + element.encode('utf-8'))
+                else:
+                    self.connections[port] = socket.create_connection(('localhost', port), timeout=5)
+                    self.connections[port].sendall(b"[" + element.encode('utf-8'))
+                self.assigned[port] = self.assigned.get(port, 0) + 1
+                return
+            except OSError as e:
+                # The asset goes to the remaining instances.
+                print("Megascans dispatcher: instance on port %d unreachable (%s)" % (port, e))
+                self.failed.add(port)
+                connection = self.connections.pop(port, None)
+                if connection is not None:
+                    connection.close()
+                try:
+                    os.remove(instance["file"])
+                except OSError:
+                    pass
+
+    def close(self):
+        for port, connection in self.connections.items():
+            try:
+                connection.sendall(b"]")
+                print("Megascans dispatcher: %d assets sent to port %d" % (self.assigned[port], port))
+            except OSError as e:
+                print("Megascans dispatcher: instance on port %d unreachable (%s)" % (port, e))
+            finally:
+                connection.close()
+        self.connections.clear()
+
+
+class Dispatcher():
+
+    policies = ("least-loaded", "round-robin")
+
+    def __init__(self, port, policy):
+        self.port = port
+        self.policy = policy
+        self.turn = 0
+        self.lock = threading.Lock()
+
+    def choose(self, instances, assigned):
+        with self.lock:
+            if self.policy == "round-robin":
+                self.turn += 1
+                return instances[(self.turn - 1) % len(instances)]
+        return min(instances, key=lambda instance: instance.get("pending", 0) + assigned.get(instance["port"], 0))
+
+    # Forwards every asset of the export as soon as it has been received.
+    def handle(self, client):
+        # The elements are forwarded as they were received, undecoded.
+        parser = MS_JsonArrayParser(decode=False)
+        export = Export(self)
+        try:
+            with client:
+                while True:
+                    data = client.recv(65536)
+                    if not data:
+                        break
+                    for element in parser.feed(data):
+                        export.forward(element)
+            parser.close()
+        except ValueError as e:
+            print("Megascans dispatcher: invalid payload (%s)" % e)
+        except OSError as e:
+            print("Megascans dispatcher: error receiving the export (%s)" % e)
+        finally:
+            export.close()
+
+    def serve(self):
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        if os.name != 'nt':
+            server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind(('localhost', self.port))
+        server.listen(5)
+        print("Megascans dispatcher listening on port %d (%s)" % (self.port, self.policy))
+        with server:
+            while True:
+                client, addr = server.accept()
+                threading.Thread(target=self.handle, args=(client,), daemon=True).start()
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Dispatch Megascans Bridge exports to several Blender instances.")
+    parser.add_argument("--port", type=int, default=28888, help="port Bridge exports to")
+    parser.add_argument("--policy", choices=Dispatcher.policies, default="least-loaded")
+    args = parser.parse_args(argv)
+    try:
+        Dispatcher(args.port, args.policy).serve()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,171 @@
+# [Quixel Megascans Livelink for Octane Blender Edition]
+#
+# Headless library builder. It imports downloaded Megascans asset folders without
+# Bridge, using the same import process as the LiveLink, and writes them into .blend
+# libraries. The folder list is split across several background Blender processes,
+# each one writing its own library, and an index of every asset is written once
+# all of them are done.
+#
+#   blender -b --python library_builder.py -- --library D:/Megascans --output D:/Libraries --workers 8
+#
+# The addon must be installed and Octane must be available in the Blender build.
+
+import argparse, json, os, re, subprocess, sys, time
+
+# Texture map types recognized in the file names, normalbump has to be tried before normal.
+mapPattern = re.compile(r'_(albedo|roughness|normalbump|normal|displacement|specular|ao|opacity|translucency|gloss|metalness|bump|fuzz|cavity)(?:_LOD\d+)?\.(jpg|jpeg|png|exr|tif|tiff)$', re.IGNORECASE)
+resolutionPattern = re.compile(r'_(\d+)K_', re.IGNORECASE)
+formatPriority = ["exr", "tif", "tiff", "png", "jpg", "jpeg"]
+meshFormats = ["fbx", "obj"]
+
+
+# Returns the <assetID>.json of an asset folder, Bridge names it after the asset id
+# which is also the suffix of the folder name.
+def findAssetJson(folder):
+    candidates = [name for name in os.listdir(folder) if name.lower().endswith(".json")]
+    for name in candidates:
+        if os.path.basename(os.path.normpath(folder)).endswith(name[:-5]):
+            return os.path.join(folder, name)
+    return None
+
+def findAssetFolders(library):
+    folders = []
+    for root, dirs, files in os.walk(library):
+        dirs.sort()
+        if any(name.lower().endswith(".json") for name in files) and findAssetJson(root):
+            folders.append(root)
+    return folders
+
+# Builds the same payload dict Bridge sends for an asset from its folder content.
+def buildPayload(folder):
+    jsonPath = findAssetJson(folder)
+    with open(jsonPath, 'r') as fl_:
+        assetJson = json.load(fl_)
+    assetID = os.path.splitext(os.path.basename(jsonPath))[0]
+
+    # Keep one file per map type: the highest resolution, then the preferred format.
+    maps = {}
+    meshList = []
+    for name in sorted(os.listdir(folder)):
+        path = os.path.join(folder, name)
+        extension = os.path.splitext(name)[1][1:].lower()
+        if extension in meshFormats:
+            meshList.append({"format": extension, "path": path})
+            continue
+        match = mapPattern.search(name)
+        if match is None:
+            continue
+        mapType = match.group(1).lower()
+        resolution = resolutionPattern.search(name)
+        rank = (-int(resolution.group(1)) if resolution else 0, formatPriority.index(extension))
+        if mapType not in maps or rank < maps[mapType][0]:
+            maps[mapType] = (rank, {"type": mapType, "format": extension, "path": path})
+
+    categories = [category.lower() for category in assetJson.get("categories", [])]
+    return {
+        "id": assetID,
+        "path": folder,
+        "name": assetJson.get("name", os.path.basename(os.path.normpath(folder))),
+        "type": "3d" if meshList else "surface",
+        "category": "Metal" if "metal" in categories else (assetJson.get("categories") or ["Megascans"])[0],
+        "components": [item[1] for item in maps.values()],
+        "meshList": meshList
+    }
+
+
+# Worker: runs inside a background Blender, imports a shard of folders and saves the library.
+def buildLibrary(folders, outputPath):
+    import bpy, addon_utils
+    # Start from an empty file, the libraries must not hold the objects of the startup file.
+    bpy.ops.wm.read_homefile(use_empty=True)
+    addon_utils.enable("MSLiveLink_Octane", default_set=True)
+    import MSLiveLink_Octane as livelink
+
+    scene = bpy.context.scene
+    scene.render.engine = 'octane'
+    if scene.render.engine != 'octane':
+        raise RuntimeError("Octane is not available in this Blender build")
+
+    start = time.time()
+    for index, folder in enumerate(folders):
+        try:
+            livelink.MS_Init_ImportProcess(livelink.MS_AssetRecord(buildPayload(folder)))
+        except Exception as e:
+            print( "Megascans LiveLink Error building payload for " + folder + ". Error: ", str(e) )
+        print("Megascans library builder: %d/%d assets (%.1fs)" % (index + 1, len(folders), time.time() - start))
+
+    livelink.Megascans_MetadataCache.save()
+    bpy.ops.wm.save_as_mainfile(filepath=outputPath)
+
+    # The journal of the scene lists the datablocks created for every asset.
+    journal = livelink.Megascans_ImportJournal.getJournal(scene)
+    with open(outputPath + ".json", 'w') as fl_:
+        json.dump({assetID: {"material": entry["material"], "objects": [item[0] for item in entry["objects"]]}
+                   for assetID, entry in journal.items()}, fl_, indent=2)
+
+# Master: shards the asset folders, runs one background Blender per shard and indexes the results.
+def buildLibraries(library, output, workers, blender, libraryName):
+    folders = findAssetFolders(library)
+    workers = max(1, min(workers, len(folders)))
+    os.makedirs(output, exist_ok=True)
+    print("Megascans library builder: %d assets on %d workers" % (len(folders), workers))
+
+    start = time.time()
+    processes = []
+    for worker in range(workers):
+        shardPath = os.path.join(output, "%s_%02d.shard.json" % (libraryName, worker))
+        with open(shardPath, 'w') as fl_:
+            json.dump(folders[worker::workers], fl_)
+        blendPath = os.path.join(output, "%s_%02d.blend" % (libraryName, worker))
+        command = [blender, "-b", "--python", os.path.abspath(__file__), "--",
+                   "--shard", shardPath, "--blend", blendPath]
+        processes.append( (blendPath, shardPath, subprocess.Popen(command)) )
+
+    index = {}
+    failed = 0
+    for blendPath, shardPath, process in processes:
+        if process.wait() != 0 or not os.path.isfile(blendPath + ".json"):
+            print("Megascans library builder: worker for " + blendPath + " failed")
+            failed += 1
+            continue
+        with open(blendPath + ".json", 'r') as fl_:
+            for assetID, entry in json.load(fl_).items():
+                entry["blend"] = os.path.basename(blendPath)
+                index[assetID] = entry
+        os.remove(shardPath)
+
+    with open(os.path.join(output, libraryName + "_index.json"), 'w') as fl_:
+        json.dump(index, fl_, indent=2)
+    print("Megascans library builder: %d assets in %.1fs, %d failed workers" % (len(index), time.time() - start, failed))
+    return failed == 0
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Build .blend libraries from Megascans asset folders.")
+    parser.add_argument("--library", help="folder containing the downloaded Megascans assets")
+    parser.add_argument("--output", help="folder the .blend libraries and the index are written to")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="number of Blender processes")
+    parser.add_argument("--blender", help="Blender executable used for the workers (defaults to the running one)")
+    parser.add_argument("--name", default="megascans", help="base name of the library files")
+    parser.add_argument("--shard", help=argparse.SUPPRESS)
+    parser.add_argument("--blend", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.shard:
+        with open(args.shard, 'r') as fl_:
+            buildLibrary(json.load(fl_), args.blend)
+        return True
+
+    if not args.library or not args.output:
+        parser.error("--library and --output are required")
+    blender = args.blender
+    if blender is None:
+        import bpy
+        blender = bpy.app.binary_path
+    return buildLibraries(args.library, args.output, args.workers, blender, args.name)
+
+
+if __name__ == "__main__":
+    # Blender passes the script arguments after "--".
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]
+    sys.exit(0 if main(argv) else 1)
@@ -0,0 +1,85 @@
+# Fake Quixel Bridge client for the offline benchmarks.
+#
+# It builds synthetic Megascans asset folders (texture maps, LOD meshes and the
+# <assetID>.json metadata) and sends Bridge-style payloads to the LiveLink socket,
+# either generated on the fly or replayed from a recorded payload file.
+#
+#   python bridge_client.py --assets 10 --library /tmp/megascans
+#   python bridge_client.py --replay recorded_payload.json
+
+import argparse, json, os, socket, time
+
+HOST, PORT = 'localhost', 28888
+
+MAP_TYPES = ["albedo", "roughness", "normal", "displacement", "specular", "ao", "opacity", "translucency"]
+SIGNATURES = {"jpg": b"\xff\xd8\xff", "exr": b"\x76\x2f\x31\x01"}
+
+
+def make_asset(library, index, texture_kb=256, lods=(0, 1, 2), surface=False):
+    assetID = "bench%05d" % index
+    assetPath = os.path.join(library, "Bench_Rock_%s" % assetID)
+    os.makedirs(assetPath, exist_ok=True)
+
+    components = []
+    for mapType in MAP_TYPES:
+        textureFormat = "exr" if mapType == "displacement" else "jpg"
+        texturePath = os.path.join(assetPath, "%s_4K_%s.%s" % (assetID, mapType.capitalize(), textureFormat))
+        if not os.path.isfile(texturePath):
+            with open(texturePath, 'wb') as file_:
+                file_.write(SIGNATURES[textureFormat] + os.urandom(texture_kb * 1024))
+        components.append({"type": mapType, "format": textureFormat, "path": texturePath,
+                           "resolution": "4096x4096"})
+
+    meshList = []
+    if not surface:
+        for lod in lods:
+            meshPath = os.path.join(assetPath, "%s_LOD%d.fbx" % (assetID, lod))
+            if not os.path.isfile(meshPath):
+                with open(meshPath, 'wb') as file_:
+                    file_.write(os.urandom(64 * 1024))
+            meshList.append({"format": "fbx", "path": meshPath, "type": "lod"})
+
+    with open(os.path.join(assetPath, assetID + ".json"), 'w') as file_:
+        json.dump({"id": assetID, "physicalSize": "2x2",
+                   "maps": [{"type": mapType, "averageColor": "#3a3a3a"} for mapType in MAP_TYPES]}, file_)
+
+    return {"type": "surface" if surface else "3d", "id": assetID, "path": assetPath,
+            "name": "Bench Rock %d" % index, "category": "Rock",
+            "components": components, "meshList": meshList}
+
+
+def make_payload(library, count, texture_kb=256, start=0):
+    return [make_asset(library, start + index, texture_kb) for index in range(count)]
+
+
+# Sends one payload over a new connection, like Bridge does for every export.
+def send_payload(payload, host=HOST, port=PORT, chunk_size=64 * 1024):
+    data = payload if isinstance(payload, bytes) else json.dumps(payload).encode('utf-8')
+    start = time.perf_counter()
+    with socket.create_connection((host, port)) as client:
+        view = memoryview(data)
+        for offset in range(0, len(data), chunk_size):
+            client.sendall(view[offset:offset + chunk_size])
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send Bridge-style payloads to the Megascans LiveLink socket.")
+    parser.add_argument("--assets", type=int, default=1, help="number of synthetic assets in the payload")
+    parser.add_argument("--library", default=os.path.join(os.getcwd(), "bench_library"), help="folder for the synthetic assets")
+    parser.add_argument("--texture-kb", type=int, default=256, help="size of each synthetic texture file")
+    parser.add_argument("--replay", help="send a recorded payload file instead of synthetic assets")
+    parser.add_argument("--port", type=int, default=PORT)
+    args = parser.parse_args()
+
+    if args.replay:
+        with open(args.replay, 'rb') as file_:
+            payload = file_.read()
+    else:
+        payload = make_payload(args.library, args.assets, args.texture_kb)
+    elapsed = send_payload(payload, port=args.port)
+    print("Sent payload in %.3fs" % elapsed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+# Offline benchmarks for the Megascans LiveLink hot paths.
+#
+# Runs on plain CPython with the stub bpy module from benchmarks/stub and a fake
+# Bridge client talking to the real ms_Init listener on localhost:28888. For 1, 10
+# and 100-asset payloads it reports:
+#
+#   receive     socket receive throughput of the listener
+#   parse       incremental payload parsing time (json.loads for reference)
+#   import      per-asset MS_Init_ImportProcess time, with the bpy calls it made
+#   end-to-end  latency from the start of the send to the first and last material
+#
+#   python benchmarks/run_benchmarks.py [--sizes 1 10 100] [--texture-kb 256] [--json results.json]
+
+import argparse, contextlib, io, json, os, statistics, sys, tempfile, threading, time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(BENCH_DIR, "stub"), os.path.dirname(BENCH_DIR), BENCH_DIR]
+
+import bpy
+import bridge_client
+import MSLiveLink_Octane as livelink
+
+
+def reset(verbose):
+    bpy.reset()
+    livelink.Megascans_ImageCache.clear()
+    livelink.Megascans_MaterialTemplates.clear()
+    livelink.Megascans_ImportJournal.clear()
+    while not livelink.Megascans_ImportQueue.empty():
+        livelink.Megascans_ImportQueue.get_nowait()
+
+
+def quiet(verbose):
+    return contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+
+
+def wait_for(condition, timeout=60.0):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            raise RuntimeError("benchmark timed out")
+        time.sleep(0.0005)
+
+
+def bench_receive(payload):
+    data = json.dumps(payload).encode('utf-8')
+    batches = []
+    server = livelink.ms_Init(lambda asset, batch, stamps: batches.append(batch))
+    server.start()
+    time.sleep(0.05)
+    try:
+        start = time.perf_counter()
+        bridge_client.send_payload(data)
+        wait_for(lambda: batches and batches[-1].total is not None)
+        elapsed = time.perf_counter() - start
+    finally:
+        server.stop()
+        server.join(5)
+    return {"bytes": len(data), "seconds": elapsed, "MB/s": len(data) / elapsed / 1e6}
+
+
+def bench_parse(payload, chunk_size=64 * 1024):
+    data = json.dumps(payload).encode('utf-8')
+    start = time.perf_counter()
+    parser = livelink.MS_JsonArrayParser()
+    assets = []
+    for offset in range(0, len(data), chunk_size):
+        assets += parser.feed(data[offset:offset + chunk_size])
+    parser.close()
+    incremental = time.perf_counter() - start
+    assert len(assets) == len(payload)
+
+    start = time.perf_counter()
+    json.loads(data)
+    reference = time.perf_counter() - start
+    return {"incremental ms": incremental * 1000, "json.loads ms": reference * 1000}
+
+
+def bench_import(payload, verbose):
+    reset(verbose)
+    durations = []
+    records = [livelink.MS_AssetRecord(asset) for asset in payload]
+    with quiet(verbose):
+        for record in records:
+            start = time.perf_counter()
+            livelink.MS_Init_ImportProcess(record)
+            durations.append(time.perf_counter() - start)
+    count = len(payload)
+    kinds = {}
+    for call in bpy.calls:
+        kinds[call[0]] = kinds.get(call[0], 0) + 1
+    return {"mean ms": statistics.mean(durations) * 1000, "max ms": max(durations) * 1000,
+            "total ms": sum(durations) * 1000, "materials": len(bpy.data.materials),
+            "calls/asset": {kind: round(number / count, 2) for kind, number in sorted(kinds.items())}}
+
+
+def bench_end_to_end(payload, verbose):
+    reset(verbose)
+    monitor = livelink.MS_LiveLinkServer()
+    server = livelink.ms_Init(monitor.importer)
+    server.start()
+    time.sleep(0.05)
+
+    imported = []
+    try:
+        data = json.dumps(payload).encode('utf-8')
+        start = time.perf_counter()
+        sender = threading.Thread(target=bridge_client.send_payload, args=(data,))
+        sender.start()
+        # Run the import timer on this thread, the way Blender calls it on its main thread.
+        with quiet(verbose):
+            while len(imported) < len(payload):
+                before = len(bpy.data.materials)
+                interval = monitor.newDataMonitor()
+                if len(bpy.data.materials) > before:
+                    imported.append(time.perf_counter() - start)
+                if time.perf_counter() - start > 120:
+                    raise RuntimeError("benchmark timed out")
+                time.sleep(interval if interval is not None else 0)
+        sender.join()
+    finally:
+        server.stop()
+        server.join(5)
+    return {"first asset ms": imported[0] * 1000, "last asset ms": imported[-1] * 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the Megascans LiveLink addon.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100], help="assets per payload")
+    parser.add_argument("--texture-kb", type=int, default=256, help="size of each synthetic texture file")
+    parser.add_argument("--library", help="folder for the synthetic assets (temporary folder by default)")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--verbose", action="store_true", help="show the addon console output")
+    args = parser.parse_args()
+
+    library = args.library or tempfile.mkdtemp(prefix="mslivelink_bench_")
+    os.environ.setdefault("BPY_STUB_USER", os.path.join(library, "bpy_user"))
+    livelink.register()
+
+    results = {}
+    start = 0
+    for size in args.sizes:
+        payload = bridge_client.make_payload(library, size, args.texture_kb, start)
+        start += size
+        results[size] = {
+            "receive": bench_receive(payload),
+            "parse": bench_parse(payload),
+            "import": bench_import(payload, args.verbose),
+            "end-to-end": bench_end_to_end(payload, args.verbose),
+        }
+        print("== %d asset payload" % size)
+        for name, values in results[size].items():
+            print("  %-11s %s" % (name, ", ".join("%s: %s" % (key, round(value, 3) if isinstance(value, float) else value)
+                                                 for key, value in values.items())))
+
+    livelink.unregister()
+    if args.json:
+        with open(args.json, 'w') as file_:
+            json.dump(results, file_, indent=2)
+
+
+if __name__ == "__main__":
+    main()
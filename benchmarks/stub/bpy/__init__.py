@@ -0,0 +1,536 @@
+# Minimal stand-in for Blender's bpy module used by the offline benchmarks.
+#
+# It implements just enough of the data API for MS_Init_ImportProcess to run on
+# plain CPython: ID collections, materials with node trees, images, collections,
+# objects and the FBX/OBJ import operators. Every node, link and image call is
+# appended to bpy.calls so a benchmark can count what an import did.
+
+import sys, os, itertools, copy
+import types as _types
+
+calls = []
+
+def record(*call):
+    calls.append(call)
+
+
+class ID:
+    _owner = None
+
+    def __init__(self, name):
+        self.__dict__['name'] = name
+        self.__dict__['props'] = {}
+        self.users = 0
+
+    def __setattr__(self, key, value):
+        if key == 'name' and self._owner is not None:
+            self._owner.rename(self, value)
+        else:
+            self.__dict__[key] = value
+
+    # Custom properties
+    def __getitem__(self, key):
+        return self.props[key]
+
+    def __setitem__(self, key, value):
+        self.props[key] = value
+
+    def __contains__(self, key):
+        return key in self.props
+
+    def get(self, key, default=None):
+        return self.props.get(key, default)
+
+
+class IDCollection:
+
+    def __init__(self, factory):
+        self.items = {}
+        self.factory = factory
+
+    def uniqueName(self, name):
+        if name not in self.items:
+            return name
+        for i in itertools.count(1):
+            candidate = "%s.%03d" % (name, i)
+            if candidate not in self.items:
+                return candidate
+
+    def new(self, name, *args):
+        item = self.factory(self.uniqueName(name), *args)
+        item._owner = self
+        self.items[item.name] = item
+        return item
+
+    def rename(self, item, name):
+        self.items.pop(item.name, None)
+        item.__dict__['name'] = self.uniqueName(name)
+        self.items[item.name] = item
+
+    def remove(self, item, **kwargs):
+        self.items.pop(item.name, None)
+
+    def get(self, name, default=None):
+        return self.items.get(name, default)
+
+    def clear(self):
+        self.items.clear()
+
+    def __getitem__(self, name):
+        return self.items[name]
+
+    def __contains__(self, name):
+        return name in self.items
+
+    def __iter__(self):
+        return iter(list(self.items.values()))
+
+    def __len__(self):
+        return len(self.items)
+
+
+# Node trees
+
+class Socket:
+
+    def __init__(self, name):
+        self.name = name
+        self.default_value = 0
+
+
+class Sockets:
+
+    def __init__(self):
+        self.items = {}
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            key = "Output %d" % key
+        if key not in self.items:
+            self.items[key] = Socket(key)
+        return self.items[key]
+
+
+class Node:
+
+    def __init__(self, bl_idname, name):
+        self.bl_idname = bl_idname
+        self.name = name
+        self.inputs = Sockets()
+        self.outputs = Sockets()
+        self.location = (0, 0)
+        self.image = None
+
+
+class Nodes:
+
+    def __init__(self):
+        self.items = []
+
+    def new(self, bl_idname):
+        record("nodes.new", bl_idname)
+        node = Node(bl_idname, "%s.%03d" % (bl_idname, len(self.items)))
+        self.items.append(node)
+        return node
+
+    def remove(self, node):
+        record("nodes.remove", node.bl_idname)
+        self.items.remove(node)
+
+    def get(self, name, default=None):
+        for node in self.items:
+            if node.name == name:
+                return node
+        return default
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return self.items[key]
+        node = self.get(key)
+        if node is None:
+            raise KeyError(key)
+        return node
+
+    def __iter__(self):
+        return iter(list(self.items))
+
+    def __len__(self):
+        return len(self.items)
+
+
+class Links:
+
+    def __init__(self):
+        self.items = []
+
+    def new(self, input_, output):
+        record("links.new", input_.name, output.name)
+        self.items.append((input_, output))
+
+
+class NodeTree:
+
+    def __init__(self, defaultNodes=True):
+        self.nodes = Nodes()
+        self.links = Links()
+        if defaultNodes:
+            self.nodes.new('ShaderNodeOutputMaterial')
+            self.nodes.new('ShaderNodeOctDiffuseMat')
+
+
+class Material(ID):
+
+    def __init__(self, name):
+        ID.__init__(self, name)
+        self.__dict__['node_tree'] = None
+        self.__dict__['use_nodes'] = False
+
+    def __setattr__(self, key, value):
+        if key == 'use_nodes' and value and self.node_tree is None:
+            self.__dict__['node_tree'] = NodeTree()
+        ID.__setattr__(self, key, value)
+
+    def copy(self):
+        record("material.copy", self.name)
+        mat = data.materials.new(self.name)
+        for key, value in self.__dict__.items():
+            if key not in ('name', 'node_tree', '_owner'):
+                mat.__dict__[key] = copy.copy(value)
+        tree = NodeTree(defaultNodes=False)
+        copies = {}
+        for node in self.node_tree.nodes:
+            copies[id(node)] = copy.copy(node)
+            tree.nodes.items.append(copies[id(node)])
+        tree.links.items = list(self.node_tree.links.items)
+        mat.__dict__['node_tree'] = tree
+        return mat
+
+
+# Images
+
+class ColorSpaceSettings:
+
+    def __init__(self):
+        self.name = "sRGB"
+
+
+class Pixels:
+
+    def __init__(self, image):
+        self.image = image
+
+    def __len__(self):
+        return self.image.size[0] * self.image.size[1] * self.image.channels
+
+    def foreach_get(self, buffer):
+        record("pixels.foreach_get", self.image.name)
+        buffer[:] = [0.5] * len(self)
+
+    def foreach_set(self, buffer):
+        record("pixels.foreach_set", self.image.name)
+
+
+class Image(ID):
+
+    def __init__(self, name, filepath="", size=(4096, 4096)):
+        ID.__init__(self, name)
+        self.filepath = filepath
+        self.filepath_raw = filepath
+        self.file_format = 'PNG'
+        self.colorspace_settings = ColorSpaceSettings()
+        self.size = size
+        self.channels = 4
+        self.depth = 32
+        self.is_float = False
+        self.has_data = True
+        self.pixels = Pixels(self)
+
+    def reload(self):
+        record("image.reload", self.filepath)
+
+    def scale(self, width, height):
+        record("image.scale", width, height)
+        self.size = (width, height)
+
+    def save(self):
+        record("image.save", self.filepath_raw)
+        with open(self.filepath_raw, 'wb') as file_:
+            file_.write(b"\xff\xd8\xff" + bytes(16))
+
+    def buffers_free(self):
+        record("image.buffers_free", self.name)
+        self.has_data = False
+
+
+class Images(IDCollection):
+
+    def new(self, name, width=1024, height=1024, alpha=False, float_buffer=False):
+        return IDCollection.new(self, name, "", (width, height))
+
+    def load(self, filepath, check_existing=False):
+        record("images.load", filepath)
+        # Read the file to account for the I/O part of a real image load.
+        with open(filepath, 'rb') as file_:
+            file_.read()
+        return IDCollection.new(self, os.path.basename(filepath), filepath)
+
+
+# Objects and collections
+
+class ObjectList:
+
+    def __init__(self):
+        self.items = []
+
+    def link(self, item):
+        self.items.append(item)
+
+    def unlink(self, item):
+        self.items.remove(item)
+
+    def __iter__(self):
+        return iter(list(self.items))
+
+    def __len__(self):
+        return len(self.items)
+
+
+class Collection(ID):
+
+    def __init__(self, name):
+        ID.__init__(self, name)
+        self.objects = ObjectList()
+        self.children = ObjectList()
+        self.hide_viewport = False
+        self.hide_render = False
+
+
+class Matrix(list):
+
+    def __init__(self, rows=None):
+        list.__init__(self, rows or [[float(i == j) for j in range(4)] for i in range(4)])
+
+    def copy(self):
+        return Matrix([list(row) for row in self])
+
+
+class Object(ID):
+
+    def __init__(self, name, object_data=None):
+        ID.__init__(self, name)
+        self.data = object_data
+        self.active_material = None
+        self.hide_render = False
+        self.hidden = False
+        self.instance_type = 'NONE'
+        self.instance_collection = None
+        self.parent = None
+        self.matrix_world = Matrix()
+
+    def hide_set(self, state):
+        self.hidden = state
+
+    def select_get(self):
+        return False
+
+    def copy(self):
+        record("object.copy", self.name)
+        obj = data.objects.new(self.name, self.data)
+        obj.active_material = self.active_material
+        obj.hide_render = self.hide_render
+        return obj
+
+
+class LayerCollection:
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.name = collection.name
+        self.exclude = False
+
+    @property
+    def children(self):
+        return {child.name: LayerCollection(child) for child in self.collection.children}
+
+
+class ViewLayer:
+
+    def __init__(self, scene):
+        self.layer_collection = LayerCollection(scene.collection)
+        self.active_layer_collection = self.layer_collection
+
+    def update(self):
+        record("view_layer.update")
+
+
+class Scene(ID):
+
+    def __init__(self, name):
+        ID.__init__(self, name)
+        self.collection = Collection("Scene Collection")
+        self.render = _types.SimpleNamespace(engine='octane')
+
+
+data = _types.SimpleNamespace(
+    images=Images(Image),
+    materials=IDCollection(Material),
+    collections=IDCollection(Collection),
+    objects=IDCollection(Object),
+    meshes=IDCollection(ID),
+    scenes=IDCollection(Scene)
+)
+
+
+# Operators
+
+def _import_scene(filepath, **kwargs):
+    record("import_scene", filepath)
+    with open(filepath, 'rb') as file_:
+        file_.read()
+    mesh = data.meshes.new(os.path.basename(filepath))
+    obj = data.objects.new(os.path.splitext(os.path.basename(filepath))[0], mesh)
+    context.view_layer.active_layer_collection.collection.objects.link(obj)
+    return {'FINISHED'}
+
+ops = _types.SimpleNamespace(
+    import_scene=_types.SimpleNamespace(fbx=_import_scene, obj=_import_scene),
+    ed=_types.SimpleNamespace(undo_push=lambda **kwargs: record("undo_push"))
+)
+
+
+# Classes and properties
+
+class bpy_struct:
+    pass
+
+class Operator(bpy_struct):
+    pass
+
+class AddonPreferences(bpy_struct):
+    pass
+
+class Panel(bpy_struct):
+    pass
+
+class PropertyGroup(bpy_struct):
+    pass
+
+class _Menu:
+
+    def append(self, function):
+        pass
+
+    def remove(self, function):
+        pass
+
+types = _types.SimpleNamespace(Operator=Operator, AddonPreferences=AddonPreferences, Panel=Panel,
+                               PropertyGroup=PropertyGroup, TOPBAR_MT_file_import=_Menu())
+
+
+class PropertyDefinition:
+
+    defaults = {"IntProperty": 0, "FloatProperty": 0.0, "BoolProperty": False, "StringProperty": ""}
+
+    def __init__(self, kind, kwargs):
+        self.kind = kind
+        self.kwargs = kwargs
+
+    def default(self):
+        if "default" in self.kwargs:
+            return self.kwargs["default"]
+        if self.kind == "EnumProperty":
+            return self.kwargs["items"][0][0]
+        return self.defaults[self.kind]
+
+def _property(kind):
+    return lambda **kwargs: PropertyDefinition(kind, kwargs)
+
+props = _types.SimpleNamespace(**{kind: _property(kind) for kind in
+                                  ["IntProperty", "FloatProperty", "BoolProperty", "StringProperty", "EnumProperty"]})
+
+
+registered_classes = []
+
+# Addon preferences are built from the annotations of the registered AddonPreferences class.
+class _Addons(dict):
+
+    def __missing__(self, key):
+        preferences = _types.SimpleNamespace()
+        for cls in registered_classes:
+            if issubclass(cls, AddonPreferences) and getattr(cls, "bl_idname", None) == key:
+                for name, definition in getattr(cls, "__annotations__", {}).items():
+                    if isinstance(definition, PropertyDefinition):
+                        setattr(preferences, name, definition.default())
+        addon = _types.SimpleNamespace(preferences=preferences)
+        self[key] = addon
+        return addon
+
+
+def _user_resource(resource_type, path="", create=False):
+    target = os.path.join(os.environ.get("BPY_STUB_USER", os.path.join(os.path.expanduser("~"), ".bpy_stub")),
+                          resource_type.lower(), path)
+    if create:
+        os.makedirs(target, exist_ok=True)
+    return target
+
+utils = _types.SimpleNamespace(register_class=registered_classes.append,
+                               unregister_class=registered_classes.remove,
+                               user_resource=_user_resource)
+
+path = _types.SimpleNamespace(abspath=lambda filepath: filepath)
+
+
+# Application
+
+class _Timers:
+
+    def __init__(self):
+        self.functions = []
+
+    def register(self, function, first_interval=0, persistent=False):
+        self.functions.append(function)
+
+    def unregister(self, function):
+        if function in self.functions:
+            self.functions.remove(function)
+
+    def is_registered(self, function):
+        return function in self.functions
+
+def _persistent(function):
+    return function
+
+app = _types.SimpleNamespace(
+    version=(2, 81, 0),
+    background=True,
+    timers=_Timers(),
+    handlers=_types.SimpleNamespace(load_pre=[], load_post=[], save_pre=[], render_pre=[], render_post=[],
+                                    render_complete=[], render_cancel=[], persistent=_persistent)
+)
+
+
+_scene = data.scenes.new("Scene")
+_workspace = _types.SimpleNamespace(status_text_set=lambda text: None)
+context = _types.SimpleNamespace(
+    scene=_scene,
+    view_layer=ViewLayer(_scene),
+    preferences=_types.SimpleNamespace(addons=_Addons(), edit=_types.SimpleNamespace(use_global_undo=True)),
+    workspace=_workspace,
+    window_manager=_types.SimpleNamespace(windows=[_types.SimpleNamespace(workspace=_workspace)])
+)
+
+
+# Clears every datablock and recorded call, keeping the registered classes.
+def reset():
+    for collection in vars(data).values():
+        collection.clear()
+    del calls[:]
+    scene = data.scenes.new("Scene")
+    context.scene = scene
+    context.view_layer = ViewLayer(scene)
+
+
+sys.modules['bpy.types'] = types
+sys.modules['bpy.props'] = props
+sys.modules['bpy.app'] = app
+sys.modules['bpy.app.handlers'] = app.handlers